@@ -0,0 +1,122 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from user_account.authentication import aauthenticate_request
+from .models import Employee
+from .cache import acached_employee_data, acollection_version, collection_etag
+from .search import search_employees
+from .projection import CUSTOM_FIELDS_PARAM, parse_projection, project_rows, shape_rows
+from .renderers import FastJSONRenderer, MessagePackRenderer
+from .serializer import EmployeeSerializer, employee_rows
+from .views import EmployeeViewSet
+
+
+# Selected with API_MODE = 'async'. Authentication and the plain list/detail reads run in
+# the event loop on the async ORM, without DRF's sync request cycle. Writes and the less common reads (cursor pages, custom field filters) are
+# handed to the regular viewset in one sync_to_async call: the async ORM has no
+# transactions, and a write has to commit together with its change log entry.
+
+_sync_list = EmployeeViewSet.as_view({'get': 'list', 'post': 'create'})
+_sync_detail = EmployeeViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+
+# Query parameters the async list understands, anything else goes to the viewset.
+# ?cf= is left to the viewset, it validates the keys against the custom field schema
+ASYNC_LIST_PARAMS = {'search', 'fields'}
+
+
+def _renders_json(request):
+    # The async reads only render JSON, MessagePack is negotiated by the viewset
+    return MessagePackRenderer.media_type not in request.headers.get('Accept', '')
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    # Rendered like the DRF views, so both modes return the same bytes
+    return HttpResponse(FastJSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def _error_response(exc):
+    # Same body as DRF's exception handler
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = _json_response(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = f'{jwt_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+    return response
+
+
+async def _cached_response(request, user, kind, build):
+    # Same caching and conditional GET handling as EmployeeViewSet.cached_response
+    version = await acollection_version(user.id)
+    etag = collection_etag(user.id, version, request.path, request.GET)
+
+    async def data():
+        return await acached_employee_data(
+            user.id, kind, (request.get_host(), request.get_full_path()), build, version=version,
+        )
+
+    detail = await data() if kind == 'detail' else None
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _json_response(detail if detail is not None else await data())
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Authorization', 'Accept'])
+    return response
+
+
+async def _authenticate(request):
+    # Returns the user, or raises the APIException DRF would answer with
+    result = await aauthenticate_request(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    return result[0]
+
+
+@csrf_exempt
+async def employee_list(request):
+    if (request.method != 'GET' or any(param not in ASYNC_LIST_PARAMS for param in request.GET)
+            or not _renders_json(request)):
+        return await sync_to_async(_sync_list)(request)
+
+    try:
+        user = await _authenticate(request)
+        projection = parse_projection(request.GET, user.id)
+    except exceptions.APIException as exc:
+        return _error_response(exc)
+
+    queryset = Employee.objects.filter(user=user)
+    search = request.GET.get('search')
+    if search:
+        queryset = search_employees(queryset, search)
+
+    async def build():
+        if projection is None:
+            return [row async for row in employee_rows(queryset)]
+        return shape_rows([row async for row in project_rows(queryset, projection)], projection)
+
+    return await _cached_response(request, user, 'list', build)
+
+
+@csrf_exempt
+async def employee_detail(request, pk):
+    if request.method != 'GET' or CUSTOM_FIELDS_PARAM in request.GET or not _renders_json(request):
+        return await sync_to_async(_sync_detail)(request, pk=pk)
+
+    try:
+        user = await _authenticate(request)
+        projection = parse_projection(request.GET, user.id)
+    except exceptions.APIException as exc:
+        return _error_response(exc)
+
+    async def build():
+        if projection is None:
+            return EmployeeSerializer(await Employee.objects.aget(user=user, pk=pk)).data
+        return shape_rows([await project_rows(Employee.objects.filter(user=user), projection).aget(pk=pk)], projection)[0]
+
+    try:
+        return await _cached_response(request, user, 'detail', build)
+    except Employee.DoesNotExist:
+        return _json_response({'error': 'Employee not found.'}, status.HTTP_404_NOT_FOUND)
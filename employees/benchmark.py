@@ -0,0 +1,317 @@
+import json
+import random
+import resource
+import statistics
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from django.contrib.auth.hashers import make_password
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+from user_account.models import CustomUser
+from user_account.utils import get_tokens
+from .compression import available_encodings, compress
+from .metrics import REQUEST_QUERIES
+from .models import CustomField, Employee
+from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+from .serializer import EmployeeSerializer, employee_rows
+
+
+SCENARIOS = ('list', 'search', 'retrieve', 'stats', 'create', 'update', 'bulk', 'login')
+
+BENCH_PASSWORD = 'bench-password'
+BULK_SIZE = 20
+
+# Field types the seeded custom fields cycle through, with a value generator each.
+# The first one is numeric, the stats scenario aggregates it
+_FIELD_VALUES = {
+    'number': lambda rng: rng.randint(0, 40),
+    'text': lambda rng: rng.choice(('remote', 'office', 'hybrid')),
+    'boolean': lambda rng: rng.random() < 0.5,
+}
+
+
+class BenchData:
+    # The seeded users, their access tokens and employee ids
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.users = []
+        self.tokens = {}
+        self.employee_ids = {}
+        self.custom_fields = {}
+        self.counter = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            self.counter += 1
+            return self.counter
+
+
+def seed(users, employees, custom_fields, seed_value=0):
+    """
+    Create `users` users with `employees` employees and `custom_fields` custom fields each.
+
+    Everything belongs to users named bench-<run id>-..., cleanup() removes them again.
+    """
+    rng = random.Random(seed_value)
+    data = BenchData(uuid.uuid4().hex[:8])
+    password = make_password(BENCH_PASSWORD)  # Hashed once, the cost is the login scenario's
+
+    for u in range(users):
+        user = CustomUser.objects.create(email=f'bench-{data.run_id}-{u}@example.com', name=f'Bench {u}', password=password)
+        fields = {
+            f'field_{k}': list(_FIELD_VALUES)[k % len(_FIELD_VALUES)] for k in range(custom_fields)
+        }
+        CustomField.objects.bulk_create(
+            CustomField(user=user, field_name=name, field_type=field_type) for name, field_type in fields.items()
+        )
+        created = Employee.objects.bulk_create(
+            (
+                Employee(
+                    user=user,
+                    name=f'Employee {u}-{e}',
+                    email=f'bench-{data.run_id}-{u}-{e}@example.com',
+                    phone_number=f'555{u:03d}{e:06d}'[:15],
+                    custom_fields={name: _FIELD_VALUES[field_type](rng) for name, field_type in fields.items()},
+                )
+                for e in range(employees)
+            ),
+            batch_size=1000,
+        )
+        data.users.append(user)
+        data.tokens[user.id] = get_tokens(user)['access']
+        data.employee_ids[user.id] = [employee.id for employee in created]
+        data.custom_fields[user.id] = fields
+    return data
+
+
+def cleanup(data):
+    # Employees, custom fields and change log entries go with the users
+    CustomUser.objects.filter(email__startswith=f'bench-{data.run_id}-').delete()
+
+
+def build_request(scenario, data, rng):
+    """Return (method, path, body, token) of one request of the scenario against a random seeded user."""
+    user = rng.choice(data.users)
+    token = data.tokens[user.id]
+    employee_ids = data.employee_ids[user.id]
+
+    def new_employee():
+        n = data.next_id()
+        return {
+            'name': f'New {n}',
+            'email': f'bench-{data.run_id}-new-{n}@example.com',
+            'phone_number': f'556{n:09d}',
+            'custom_fields': {
+                name: _FIELD_VALUES[field_type](rng) for name, field_type in data.custom_fields[user.id].items()
+            },
+        }
+
+    if scenario == 'list':
+        return 'GET', '/employee/api/employees/?page_size=50', None, token
+    if scenario == 'search':
+        return 'GET', f'/employee/api/employees/?search=Employee%20{data.users.index(user)}-{rng.randint(0, 9)}', None, token
+    if scenario == 'retrieve':
+        return 'GET', f'/employee/api/employees/{rng.choice(employee_ids)}/', None, token
+    if scenario == 'stats':
+        fields = data.custom_fields[user.id]
+        params = {
+            'numeric': ','.join(name for name, field_type in fields.items() if field_type == 'number'),
+            'group_by': ','.join(name for name, field_type in fields.items() if field_type != 'number'),
+        }
+        query = urlencode({key: value for key, value in params.items() if value}, safe=',')
+        return 'GET', f'/employee/api/employees/stats/?{query}', None, token
+    if scenario == 'create':
+        return 'POST', '/employee/api/employees/', new_employee(), token
+    if scenario == 'update':
+        return 'PATCH', f'/employee/api/employees/{rng.choice(employee_ids)}/', {'name': f'Renamed {data.next_id()}'}, token
+    if scenario == 'bulk':
+        operations = [{'op': 'create', 'data': new_employee()} for _ in range(BULK_SIZE // 2)]
+        operations += [
+            {'op': 'update', 'id': employee_id, 'data': {'name': f'Bulk {data.next_id()}'}}
+            for employee_id in rng.sample(employee_ids, min(BULK_SIZE // 2, len(employee_ids)))
+        ]
+        return 'POST', '/employee/api/employees/bulk/', operations, token
+    if scenario == 'login':
+        return 'POST', '/auth/api/login/', {'email': user.email, 'password': BENCH_PASSWORD}, None
+    raise ValueError(f'Unknown scenario: {scenario}')
+
+
+class ClientDriver:
+    # In process through the test client, the full middleware stack but no sockets.
+    # The test client is not thread safe, requests run one at a time
+
+    concurrent = False
+
+    def __init__(self, headers=None):
+        # Sent with every request, e.g. Accept-Encoding. Responses are not decompressed,
+        # the sizes are the bytes on the wire
+        self.client = Client()
+        self.headers = headers or {}
+
+    def request(self, method, path, body, token):
+        headers = dict(self.headers)
+        if token:
+            headers['authorization'] = f'Bearer {token}'
+        response = self.client.generic(
+            method, path, json.dumps(body) if body is not None else '', content_type='application/json', headers=headers,
+        )
+        return response.status_code, len(response.content)
+
+
+class HTTPDriver:
+    # Over HTTP against a running server
+
+    concurrent = True
+
+    def __init__(self, base_url, headers=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = headers or {}
+
+    def request(self, method, path, body, token):
+        headers = dict(self.headers, **{'Content-Type': 'application/json'})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        request = urllib.request.Request(
+            self.base_url + path, method=method, headers=headers,
+            data=json.dumps(body).encode() if body is not None else None,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, len(error.read())
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _query_totals():
+    # Sum and count of the middleware's per request query histogram, over all routes
+    with REQUEST_QUERIES._lock:
+        series = list(REQUEST_QUERIES.series.values())
+    return sum(s['sum'] for s in series), sum(s['count'] for s in series)
+
+
+def run_scenario(driver, data, scenario, requests, concurrency=1, trace_memory=False, seed_value=0):
+    """
+    Send `requests` requests of one scenario and summarize them.
+
+    Queries per request come from the metrics middleware, so they are only known when
+    the server runs in this process. CPU time is this process's, server and client.
+    """
+    rng = random.Random(seed_value)
+    planned = [build_request(scenario, data, rng) for _ in range(requests)]
+
+    def send(planned_request):
+        started = time.perf_counter()
+        status_code, size = driver.request(*planned_request)
+        return status_code, size, time.perf_counter() - started
+
+    queries_before, measured_before = _query_totals()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    if driver.concurrent and concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(send, planned))
+    else:
+        results = [send(planned_request) for planned_request in planned]
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    queries_after, measured_after = _query_totals()
+
+    latencies = sorted(latency for _, _, latency in results)
+    measured = measured_after - measured_before
+    return {
+        'requests': len(results),
+        'errors': sum(1 for status_code, _, _ in results if status_code >= 400),
+        'rps': round(len(results) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'queries_per_request': round((queries_after - queries_before) / measured, 2) if measured else None,
+        'response_bytes': round(statistics.fmean(size for _, size, _ in results)),
+        'cpu_ms_per_request': round(cpu / len(results) * 1000, 2),
+        # ru_maxrss is KiB on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'traced_peak_mb': round(traced_peak / 1024 / 1024, 2) if traced_peak is not None else None,
+    }
+
+
+def run_serialization(data, page_size, repeat=3):
+    """
+    Serialize and render one page of `page_size` employees the old way (EmployeeSerializer and
+    JSONRenderer) and through the fast path (employee_rows and FastJSONRenderer), best of `repeat`.
+
+    Both paths have to produce the same bytes, `identical` reports whether they did.
+    """
+    queryset = Employee.objects.filter(user__in=data.users).order_by('id')[:page_size]
+    paths = {
+        'serializer': lambda: JSONRenderer().render(EmployeeSerializer(queryset, many=True).data),
+        'fast': lambda: FastJSONRenderer().render(list(employee_rows(queryset))),
+    }
+    result = {'rows': queryset.count()}
+    rendered = {}
+    for name, render in paths.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rendered[name] = render()
+            timings.append(time.perf_counter() - started)
+        result[f'{name}_rows_per_sec'] = round(result['rows'] / min(timings))
+    result['speedup'] = round(result['fast_rows_per_sec'] / result['serializer_rows_per_sec'], 2)
+    result['identical'] = rendered['serializer'] == rendered['fast']
+    return result
+
+
+def run_wire_formats(data, page_size, repeat=3):
+    """
+    Bytes and CPU time per response of a list page of `page_size` employees, for JSON and
+    MessagePack (when installed), sent as is and with every installed Content-Encoding.
+
+    CPU time covers rendering and compressing, best of `repeat`.
+    """
+    rows = list(employee_rows(Employee.objects.filter(user__in=data.users).order_by('id')[:page_size]))
+    renderers = {'json': FastJSONRenderer()}
+    if msgpack is not None:
+        renderers['msgpack'] = MessagePackRenderer()
+
+    formats = {}
+    for name, renderer in renderers.items():
+        for encoding in ('identity', *available_encodings()):
+            timings = []
+            for _ in range(repeat):
+                started = time.process_time()
+                body = renderer.render(rows)
+                if encoding != 'identity':
+                    body = compress(body, encoding)
+                timings.append(time.process_time() - started)
+            formats[f'{name}+{encoding}'] = {'bytes': len(body), 'cpu_ms': round(min(timings) * 1000, 3)}
+    return {'rows': len(rows), 'formats': formats}
+
+
+def compare(results, baseline, max_regression):
+    # Scenarios whose p95 got more than `max_regression` (a fraction) slower than the baseline
+    regressions = []
+    for scenario, result in results.items():
+        before = baseline.get('results', {}).get(scenario)
+        if 'p95_ms' not in result:
+            continue  # Not a request scenario, e.g. the serialization timings
+        if before and before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append((scenario, before['p95_ms'], result['p95_ms']))
+    return regressions
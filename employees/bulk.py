@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Employee, EmployeeChange
+from .changes import record_changes
+from .schema import get_custom_field_validators
+from .serializer import EmployeeSerializer, BulkEmployeeSerializer
+
+
+BULK_BATCH_SIZE = getattr(settings, 'EMPLOYEE_BULK_BATCH_SIZE', 1000)
+BULK_MAX_OPERATIONS = getattr(settings, 'EMPLOYEE_BULK_MAX_OPERATIONS', 10000)
+
+
+def _error(index, op, status_code, errors):
+    return {'index': index, 'op': op, 'status': status_code, 'errors': errors}
+
+
+def apply_bulk_operations(user, operations, context):
+    """
+    Validate and apply a list of create/update/delete operations for one user.
+
+    Each operation is {"op": "create", "data": {...}}, {"op": "update", "id": 1, "data": {...}}
+    or {"op": "delete", "id": 1}. Invalid operations, and operations on an id an earlier one
+    already targets, are reported and skipped, the valid ones are written in chunks inside one
+    transaction. Returns one result per operation.
+    """
+    results = [None] * len(operations)
+
+    # One custom field lookup and one employee lookup for the whole batch
+    context = dict(context, custom_field_validators=get_custom_field_validators(user.id))
+    target_ids = {
+        operation.get('id') for operation in operations
+        if isinstance(operation, dict) and isinstance(operation.get('id'), int)
+    }
+    targets = Employee.objects.filter(user=user).in_bulk(target_ids)
+
+    creates, updates, deletes = [], [], []
+    targeted = set()
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in ('create', 'update', 'delete'):
+            results[index] = _error(index, op, 400, {'op': ['Must be one of: create, update, delete.']})
+            continue
+
+        employee = None
+        if op != 'create':
+            employee = targets.get(operation.get('id'))
+            if employee is None:
+                results[index] = _error(index, op, 404, {'id': ['Employee not found.']})
+                continue
+            # Later operations would act on a row an earlier one already changed or deleted
+            if employee.id in targeted:
+                results[index] = _error(index, op, 400, {'id': ['Only one operation per employee is allowed in a batch.']})
+                continue
+            targeted.add(employee.id)
+        if op == 'delete':
+            deletes.append((index, employee))
+            continue
+
+        serializer = BulkEmployeeSerializer(
+            employee, data=operation.get('data') or {}, partial=op == 'update', context=context
+        )
+        if not serializer.is_valid():
+            results[index] = _error(index, op, 400, serializer.errors)
+            continue
+        (creates if op == 'create' else updates).append((index, employee, serializer.validated_data))
+
+    # Emails must stay unique across the batch and against existing rows,
+    # rows deleted in the same batch release their email
+    deleted_ids = {employee.id for _, employee in deletes}
+    emails = [data['email'] for _, _, data in creates + updates if 'email' in data]
+    owners = dict(Employee.objects.filter(email__in=emails).values_list('email', 'id'))
+    claimed = set()
+    for pending in (creates, updates):
+        for item in list(pending):
+            index, employee, data = item
+            email = data.get('email')
+            if email is None:
+                continue
+            owner = owners.get(email)
+            taken = owner is not None and owner not in deleted_ids and (employee is None or owner != employee.id)
+            if taken or email in claimed:
+                results[index] = _error(index, 'create' if employee is None else 'update', 400,
+                                        {'email': ['employee with this email already exists.']})
+                pending.remove(item)
+                continue
+            claimed.add(email)
+
+    with transaction.atomic():
+        if deleted_ids:
+            Employee.objects.filter(user=user, id__in=deleted_ids).delete()
+
+        if updates:
+            # bulk_update skips auto_now, updated_at is set by hand
+            now = timezone.now()
+            update_fields = {'updated_at'}
+            for _, employee, data in updates:
+                for attr, value in data.items():
+                    setattr(employee, attr, value)
+                employee.updated_at = now
+                update_fields.update(data)
+            if update_fields:
+                Employee.objects.bulk_update(
+                    [employee for _, employee, _ in updates], sorted(update_fields), batch_size=BULK_BATCH_SIZE
+                )
+
+        created = Employee.objects.bulk_create(
+            [Employee(user=user, **data) for _, _, data in creates], batch_size=BULK_BATCH_SIZE
+        )
+
+        # Feed entries commit together with the writes they describe
+        record_changes(user, EmployeeChange.DELETE, sorted(deleted_ids))
+        record_changes(user, EmployeeChange.UPSERT,
+                       [employee.id for _, employee, _ in updates] + [employee.id for employee in created])
+
+    for index, employee in deletes:
+        results[index] = {'index': index, 'op': 'delete', 'status': 204, 'id': employee.id}
+    for index, employee, _ in updates:
+        results[index] = {'index': index, 'op': 'update', 'status': 200, 'id': employee.id,
+                          'data': EmployeeSerializer(employee).data}
+    for (index, _, _), employee in zip(creates, created):
+        results[index] = {'index': index, 'op': 'create', 'status': 201, 'id': employee.id,
+                          'data': EmployeeSerializer(employee).data}
+
+    return results
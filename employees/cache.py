@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+
+EMPLOYEE_CACHE_TIMEOUT = getattr(settings, 'EMPLOYEE_CACHE_TIMEOUT', 5 * 60)
+
+# Only one request rebuilds a missing entry, the others wait up to LOCK_WAIT seconds for it
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+_metrics = {'hits': 0, 'misses': 0, 'waits': 0, 'invalidations': 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(name):
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def cache_metrics():
+    # Hit/miss counters of this process since start
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def _version_key(user_id):
+    return f'employees:version:{user_id}'
+
+
+def collection_version(user_id):
+    """
+    Return the version of the user's employee collection.
+
+    Every write bumps it, so all cached pages and details of the user go stale at
+    once without having to find and delete them.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Unknown or evicted, start a fresh version no old entry can match
+        cache.add(_version_key(user_id), time.time_ns(), None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+async def acollection_version(user_id):
+    # collection_version() for async views
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), time.time_ns(), None)
+        version = await cache.aget(_version_key(user_id))
+    return version
+
+
+def collection_etag(user_id, version, path, query_params):
+    # Weak: the same data can be rendered by different renderers. The resource is part of it,
+    # so a validator of one URL never matches another. Versions only tell writes apart, they
+    # are not sent as Last-Modified, whose whole seconds would miss writes in the same second
+    query = urlencode(sorted((key, value) for key in query_params for value in query_params.getlist(key)))
+    resource = hashlib.md5(f'{path}?{query}'.encode()).hexdigest()[:12]
+    return f'W/"{user_id}-{version}-{resource}"'
+
+
+def bump_collection_version(user_id):
+    cache.set(_version_key(user_id), time.time_ns(), None)
+    _count('invalidations')
+
+
+def _data_key(user_id, version, kind, identity):
+    digest = hashlib.md5(str(identity).encode()).hexdigest()
+    return f'employees:{user_id}:{version}:{kind}:{digest}'
+
+
+def cached_employee_data(user_id, kind, identity, build, version=None):
+    """
+    Read-through cache for serialized employee data of one user.
+
+    `kind` is 'list', 'detail' or 'stats', `identity` tells entries of the same kind apart
+    (query string, pk). `build` produces the data on a miss. Callers that already
+    read the collection version pass it in to save a cache round trip.
+    """
+    if version is None:
+        version = collection_version(user_id)
+    key = _data_key(user_id, version, kind, identity)
+
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return data
+    _count('misses')
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # Someone else is rebuilding this entry, wait for it instead of stampeding the database
+        _count('waits')
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return build()
+
+    try:
+        data = build()
+        cache.set(key, data, EMPLOYEE_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return data
+
+
+async def acached_employee_data(user_id, kind, identity, build, version=None):
+    # cached_employee_data() for async views, `build` is a coroutine function.
+    # Entries are shared with the sync views
+    if version is None:
+        version = await acollection_version(user_id)
+    key = _data_key(user_id, version, kind, identity)
+
+    data = await cache.aget(key)
+    if data is not None:
+        _count('hits')
+        return data
+    _count('misses')
+
+    lock_key = f'{key}:lock'
+    if not await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        _count('waits')
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            data = await cache.aget(key)
+            if data is not None:
+                return data
+        return await build()
+
+    try:
+        data = await build()
+        await cache.aset(key, data, EMPLOYEE_CACHE_TIMEOUT)
+    finally:
+        await cache.adelete(lock_key)
+    return data
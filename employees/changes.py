@@ -0,0 +1,131 @@
+import base64
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from user_account.models import CustomUser
+from .models import Employee, EmployeeChange, ChangeLogCompaction
+from .serializer import EmployeeSerializer
+
+
+CHANGES_PAGE_SIZE = getattr(settings, 'EMPLOYEE_CHANGES_PAGE_SIZE', 1000)
+
+
+class ResyncRequired(Exception):
+    # The token points before compacted history, the mirror has to start over from an export
+    pass
+
+
+def encode_token(position):
+    return base64.urlsafe_b64encode(f'v1:{position}'.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        version, position = raw.split(':')
+        if version != 'v1':
+            raise ValueError(token)
+        return int(position)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid token: {token}")
+
+
+def _lock_feed(user):
+    # Held until the writing transaction commits, so a user's change ids are handed out in
+    # commit order and a reader never sees a later id before an earlier one. NO KEY keeps
+    # inserts referencing the user unblocked. Must run inside the write's transaction.
+    # SQLite runs one write transaction at a time, ids are in commit order already
+    if not connection.features.has_select_for_update:
+        return
+    list(CustomUser.objects.select_for_update(no_key=True).filter(pk=user.pk).values_list('pk'))
+
+
+def record_changes(user, op, employee_ids):
+    if not employee_ids:
+        return
+    _lock_feed(user)
+    EmployeeChange.objects.bulk_create(
+        [EmployeeChange(user=user, employee_id=employee_id, op=op) for employee_id in employee_ids],
+        batch_size=1000,
+    )
+
+
+def record_field_removed(user, field_name):
+    _lock_feed(user)
+    EmployeeChange.objects.create(user=user, op=EmployeeChange.FIELD_REMOVED, field_name=field_name)
+
+
+def _compacted_through(user):
+    # The user's resync floor, compactions without a user predate per user floors
+    return ChangeLogCompaction.objects.filter(Q(user=user) | Q(user__isnull=True)).aggregate(
+        position=Max('compacted_through'))['position']
+
+
+def head_token(user):
+    # Position of the latest change, a mirror takes it before running a full export
+    position = EmployeeChange.objects.filter(user=user).aggregate(position=Max('id'))['position']
+    return encode_token(max(position or 0, _compacted_through(user) or 0))
+
+
+def changes_since(user, position, limit=CHANGES_PAGE_SIZE):
+    """
+    Return the user's changes after `position` as a feed page.
+
+    Several changes of one employee collapse into its latest state: an upsert with the
+    current data, or a delete when the row is gone. Entries are recorded under a per user
+    lock (see _lock_feed), so every visible id of the user follows all ids committed
+    before it and a transaction committing late cannot slip in behind the token.
+    """
+    compacted = _compacted_through(user)
+    if compacted is not None and position < compacted:
+        raise ResyncRequired()
+
+    entries = list(EmployeeChange.objects.filter(user=user, id__gt=position).order_by('id')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Keep the last entry per employee, field removals stay in order
+    latest = {}
+    for entry in entries:
+        key = ('employee', entry.employee_id) if entry.employee_id is not None else ('entry', entry.id)
+        latest.pop(key, None)
+        latest[key] = entry
+
+    upsert_ids = [entry.employee_id for entry in latest.values() if entry.op == EmployeeChange.UPSERT]
+    current = Employee.objects.filter(user=user).in_bulk(upsert_ids)
+
+    changes = []
+    for entry in latest.values():
+        if entry.op == EmployeeChange.FIELD_REMOVED:
+            changes.append({'op': entry.op, 'field_name': entry.field_name})
+        elif entry.op == EmployeeChange.UPSERT and entry.employee_id in current:
+            changes.append({'op': entry.op, 'id': entry.employee_id,
+                            'data': EmployeeSerializer(current[entry.employee_id]).data})
+        else:
+            # Deleted, or upserted and deleted again before this page was read
+            changes.append({'op': EmployeeChange.DELETE, 'id': entry.employee_id})
+
+    return {
+        'changes': changes,
+        'next': encode_token(entries[-1].id if entries else position),
+        'has_more': has_more,
+    }
+
+
+def compact_changes(older_than):
+    """
+    Delete changes created before `older_than`, returns the number of deleted entries.
+
+    Each user's tokens from before their last deleted entry have to resync, other users'
+    tokens are not affected.
+    """
+    old = EmployeeChange.objects.filter(created_at__lt=older_than)
+    with transaction.atomic():
+        floors = list(old.order_by().values('user').annotate(position=Max('id')))
+        if not floors:
+            return 0
+        deleted, _ = old.delete()
+        ChangeLogCompaction.objects.bulk_create(
+            ChangeLogCompaction(user_id=floor['user'], compacted_through=floor['position']) for floor in floors
+        )
+    return deleted
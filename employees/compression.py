@@ -0,0 +1,120 @@
+import zlib
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # Optional, pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional, pip install zstandard
+    zstandard = None
+
+
+# Levels tuned for responses compressed on every request rather than for the smallest output
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Server preference when the client accepts several encodings equally
+COMPRESSION_ENCODINGS = getattr(settings, 'COMPRESSION_ENCODINGS', ('zstd', 'br', 'gzip'))
+
+
+class _GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+
+    def compress(self, data):
+        # Flushed per chunk so a streamed export reaches the client as it is produced
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Content-Encoding -> (one shot compress, streaming compressor), only what is installed
+CODECS = {'gzip': (lambda data: zlib.compress(data, GZIP_LEVEL, wbits=31), _GzipStream)}
+if brotli is not None:
+    CODECS['br'] = (lambda data: brotli.compress(data, quality=BROTLI_QUALITY), _BrotliStream)
+if zstandard is not None:
+    CODECS['zstd'] = (lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), _ZstdStream)
+
+
+def available_encodings():
+    return [encoding for encoding in COMPRESSION_ENCODINGS if encoding in CODECS]
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the Content-Encoding for an Accept-Encoding header, or None to send the body as is.
+
+    The highest q value wins, ties go to the order of COMPRESSION_ENCODINGS. `*` covers
+    the encodings the header doesn't name, q=0 refuses one.
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    return CODECS[encoding][0](data)
+
+
+def compress_stream(chunks, encoding):
+    stream = CODECS[encoding][1]()
+    for chunk in chunks:
+        compressed = stream.compress(chunk)
+        if compressed:
+            yield compressed
+    yield stream.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    # compress_stream() for async streaming responses
+    stream = CODECS[encoding][1]()
+    async for chunk in chunks:
+        compressed = stream.compress(chunk)
+        if compressed:
+            yield compressed
+    yield stream.finish()
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Func, JSONField, TextField, Value
+from django.db.models.functions import Cast, Now
+from django.utils import timezone
+from .field_types import FIELD_TYPES
+from .models import Employee
+
+
+CUSTOM_FIELD_CLEANUP_CHUNK_SIZE = getattr(settings, 'CUSTOM_FIELD_CLEANUP_CHUNK_SIZE', 1000)
+
+
+class JSONBDeleteKey(Func):
+    # Postgres `jsonb - text`: the same document without the given top level key
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = JSONField()
+
+
+def remove_custom_field_values(user, field_name, on_progress=None):
+    """
+    Drop `field_name` from custom_fields of every employee of `user`.
+
+    On Postgres this is a single UPDATE over the rows that hold the key, other
+    backends rewrite the rows in chunks with bulk_update. Returns the number of
+    employees changed, on_progress(count) is called after every chunk.
+    """
+    queryset = Employee.objects.filter(user=user, custom_fields__has_key=field_name)
+
+    if connections[queryset.db].vendor == 'postgresql':
+        updated = queryset.update(
+            custom_fields=JSONBDeleteKey(F('custom_fields'), Cast(Value(field_name), TextField())),
+            updated_at=Now(),
+        )
+        if on_progress is not None:
+            on_progress(updated)
+        return updated
+
+    updated, batch, now = 0, [], timezone.now()
+    for employee in queryset.only('id', 'custom_fields').iterator(chunk_size=CUSTOM_FIELD_CLEANUP_CHUNK_SIZE):
+        employee.custom_fields.pop(field_name, None)
+        employee.updated_at = now
+        batch.append(employee)
+        if len(batch) >= CUSTOM_FIELD_CLEANUP_CHUNK_SIZE:
+            updated += Employee.objects.bulk_update(batch, ['custom_fields', 'updated_at'])
+            batch = []
+            if on_progress is not None:
+                on_progress(updated)
+    if batch:
+        updated += Employee.objects.bulk_update(batch, ['custom_fields', 'updated_at'])
+        if on_progress is not None:
+            on_progress(updated)
+    return updated
+
+
+def convert_custom_field_values(user, field_name, field_type):
+    """
+    Coerce the stored `field_name` values of `user`'s employees to `field_type`.
+
+    Every value is checked before anything is written: when one doesn't convert a
+    ValueError names the employees holding such values and nothing changes. Returns the
+    ids of the employees whose value was rewritten. Run it inside a transaction.
+    """
+    coerce = FIELD_TYPES[field_type]
+    queryset = (
+        Employee.objects.filter(user=user, custom_fields__has_key=field_name).only('id', 'custom_fields').order_by('id')
+    )
+
+    failed = []
+    for employee in queryset.iterator(chunk_size=CUSTOM_FIELD_CLEANUP_CHUNK_SIZE):
+        value = employee.custom_fields[field_name]
+        try:
+            if value is not None:
+                coerce(value)
+        except ValueError:
+            failed.append(employee.id)
+    if failed:
+        examples = ', '.join(str(employee_id) for employee_id in failed[:10])
+        raise ValueError(f"{field_name} can't become {field_type}, the values of {len(failed)} employees don't convert "
+                         f"(ids {examples}{', ...' if len(failed) > 10 else ''}). Fix or clear them first.")
+
+    def converted(employees):
+        # (employee, new value) of the values the new type changes, stored nulls stay null
+        for employee in employees:
+            value = employee.custom_fields[field_name]
+            if value is None:
+                continue
+            new_value = coerce(value)
+            # 1 == True, the type tells a number from a boolean
+            if new_value != value or type(new_value) is not type(value):
+                yield employee, new_value
+
+    changed, batch, now = [], [], timezone.now()
+    for employee, new_value in converted(queryset.iterator(chunk_size=CUSTOM_FIELD_CLEANUP_CHUNK_SIZE)):
+        employee.custom_fields[field_name] = new_value
+        employee.updated_at = now
+        batch.append(employee)
+        if len(batch) >= CUSTOM_FIELD_CLEANUP_CHUNK_SIZE:
+            Employee.objects.bulk_update(batch, ['custom_fields', 'updated_at'])
+            changed += [employee.id for employee in batch]
+            batch = []
+    if batch:
+        Employee.objects.bulk_update(batch, ['custom_fields', 'updated_at'])
+        changed += [employee.id for employee in batch]
+    return changed
@@ -0,0 +1,37 @@
+import threading
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Per database alias, how often this process set up a connection. Without a pool every
+# one is a TCP and auth handshake, with a pool it is a checkout from the pool
+_connects = {}
+_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def _count_connect(sender, connection, **kwargs):
+    with _lock:
+        _connects[connection.alias] = _connects.get(connection.alias, 0) + 1
+
+
+def database_metrics():
+    """
+    Connection metrics of this process per database alias.
+
+    'connects' counts connection setups, 'pool' holds psycopg's pool statistics
+    (pool_size, pool_available, requests_waiting, requests_wait_ms, ...) when the
+    alias uses DB_CONN_MODE = 'pool'.
+    """
+    with _lock:
+        metrics = {alias: {'connects': count} for alias, count in _connects.items()}
+
+    for alias in connections:
+        entry = metrics.setdefault(alias, {'connects': 0})
+        entry['conn_max_age'] = connections[alias].settings_dict.get('CONN_MAX_AGE', 0)
+        # Only read pools that exist, looking one up would open it
+        pool = getattr(type(connections[alias]), '_connection_pools', {}).get(alias)
+        if pool is not None:
+            entry['pool'] = pool.get_stats()
+    return metrics
@@ -0,0 +1,83 @@
+import csv
+import io
+from django.conf import settings
+from .renderers import dumps
+from .schema import get_custom_field_schema
+from .serializer import employee_rows
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EMPLOYEE_EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+# Rows are grouped into chunks of roughly this many characters before being sent
+BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(queryset):
+    # Server-side cursor on Postgres, only one chunk of rows is held in memory
+    if not queryset.ordered:
+        queryset = queryset.order_by('id')
+    return employee_rows(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def buffered(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def csv_lines(rows, custom_field_names):
+    # One column per custom field of the user, missing values are left empty
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    def line(values):
+        writer.writerow(values)
+        value = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return value
+
+    yield line(['id', 'name', 'email', 'phone_number', *custom_field_names])
+    for row in rows:
+        custom_fields = row['custom_fields'] or {}
+        yield line([
+            row['id'], row['name'], row['email'], row['phone_number'],
+            *(custom_fields.get(name, '') for name in custom_field_names),
+        ])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+def json_array(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        # Each row is written exactly like in the list response
+        yield separator + dumps(row)
+        separator = ','
+    yield ']'
+
+
+def export_employees(user, queryset, export_format):
+    """Return an iterator of text chunks with the employees in the requested format."""
+    rows = export_rows(queryset)
+    if export_format == 'csv':
+        custom_field_names = list(get_custom_field_schema(user.id))
+        return buffered(csv_lines(rows, custom_field_names))
+    if export_format == 'ndjson':
+        return buffered(ndjson_lines(rows))
+    return buffered(json_array(rows))
@@ -0,0 +1,99 @@
+import math
+from datetime import date
+
+
+# Each coercer turns an incoming value into the native JSON value stored in
+# Employee.custom_fields, or raises ValueError with the message for the client.
+
+def coerce_text(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError('A text value is required.')
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def coerce_number(value):
+    if isinstance(value, bool):
+        raise ValueError('A valid number is required.')
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            value = int(text)
+        except ValueError:
+            try:
+                value = float(text)
+            except ValueError:
+                raise ValueError('A valid number is required.')
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError('A valid number is required.')
+        return int(value) if value.is_integer() else value
+    if isinstance(value, int):
+        return value
+    raise ValueError('A valid number is required.')
+
+
+TRUE_VALUES = {'true', '1', 'yes', 'on'}
+FALSE_VALUES = {'false', '0', 'no', 'off'}
+
+
+def coerce_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, str)):
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+    raise ValueError('A valid boolean is required.')
+
+
+def coerce_date(value):
+    # JSON has no date type, dates are stored as ISO 8601 strings so they sort correctly
+    try:
+        return date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError('Date has wrong format. Use YYYY-MM-DD.')
+
+
+def keep_value(value):
+    return value
+
+
+FIELD_TYPES = {
+    'text': coerce_text,
+    'number': coerce_number,
+    'boolean': coerce_boolean,
+    'date': coerce_date,
+}
+
+
+def compile_validators(schema):
+    # {field_name: field_type} -> {field_name: coercer}, types from before this check are kept as is
+    return {name: FIELD_TYPES.get(field_type, keep_value) for name, field_type in schema.items()}
+
+
+def coerce_custom_fields(validators, values):
+    """
+    Validate and coerce one employee's custom_fields against compiled validators.
+
+    Returns (cleaned, errors) where errors maps field names to messages. null is always
+    accepted so a value can be cleared.
+    """
+    cleaned, errors = {}, {}
+    for key, value in values.items():
+        coerce = validators.get(key)
+        if coerce is None:
+            errors[key] = 'Invalid custom field.'
+            continue
+        if value is None:
+            cleaned[key] = None
+            continue
+        try:
+            cleaned[key] = coerce(value)
+        except ValueError as e:
+            errors[key] = str(e)
+    return cleaned, errors
+
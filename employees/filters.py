@@ -0,0 +1,71 @@
+from django.db import connections
+from django.db.models.fields.json import KeyTransform
+from rest_framework.exceptions import ValidationError
+
+
+CUSTOM_FIELD_PREFIX = 'cf.'
+CUSTOM_FIELD_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'in', 'isnull', 'icontains')
+ORDERING_FIELDS = ('id', 'name', 'email')
+
+
+def _coerce(validators, field_name, param, value):
+    try:
+        return validators[field_name](value)
+    except ValueError as e:
+        raise ValidationError({param: str(e)})
+
+
+def filter_custom_fields(queryset, query_params, validators):
+    """
+    Apply ?cf.<field>[__<lookup>]=<value> filters, e.g. ?cf.experience__gte=5.
+
+    Values are coerced with the field's type so they compare against the native
+    JSON values stored by the serializer.
+    """
+    postgres = connections[queryset.db].vendor == 'postgresql'
+    for index, (param, value) in enumerate(query_params.items()):
+        if not param.startswith(CUSTOM_FIELD_PREFIX):
+            continue
+        field_name, _, lookup = param[len(CUSTOM_FIELD_PREFIX):].partition('__')
+        lookup = lookup or 'exact'
+        if field_name not in validators:
+            raise ValidationError({param: f"Unknown custom field '{field_name}'."})
+        if lookup not in CUSTOM_FIELD_LOOKUPS:
+            raise ValidationError({param: f"Lookup must be one of: {', '.join(CUSTOM_FIELD_LOOKUPS)}."})
+
+        if lookup == 'isnull':
+            value = value.lower() in ('true', '1')
+        elif lookup == 'in':
+            value = [_coerce(validators, field_name, param, item) for item in value.split(',')]
+        elif lookup != 'icontains':
+            value = _coerce(validators, field_name, param, value)
+
+        if lookup == 'exact' and postgres:
+            # custom_fields @> {"key": value}, served by the GIN jsonb_path_ops index
+            queryset = queryset.filter(custom_fields__contains={field_name: value})
+            continue
+
+        # An alias instead of custom_fields__<key> keeps keys containing '__' intact
+        alias = f'cf_{index}'
+        queryset = queryset.alias(**{alias: KeyTransform(field_name, 'custom_fields')})
+        queryset = queryset.filter(**{f'{alias}__{lookup}': value})
+    return queryset
+
+
+def order_employees(queryset, ordering, validators):
+    # ?ordering=name, -email or -cf.experience, id breaks ties
+    field_name = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+
+    if field_name.startswith(CUSTOM_FIELD_PREFIX):
+        key = field_name[len(CUSTOM_FIELD_PREFIX):]
+        if key not in validators:
+            raise ValidationError({'ordering': f"Unknown custom field '{key}'."})
+        expression = KeyTransform(key, 'custom_fields')
+        expression = expression.desc(nulls_last=True) if descending else expression.asc(nulls_last=True)
+    elif field_name in ORDERING_FIELDS:
+        expression = ordering
+    else:
+        raise ValidationError({'ordering': f"Cannot order by '{field_name}'."})
+
+    return queryset.order_by(expression, '-id' if descending else 'id')
@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from .models import Employee, EmployeeChange
+from .cache import bump_collection_version
+from .changes import record_changes
+from .schema import get_custom_field_validators
+from .serializer import BulkEmployeeSerializer
+
+
+IMPORT_BATCH_SIZE = getattr(settings, 'EMPLOYEE_IMPORT_BATCH_SIZE', 2000)
+IMPORT_FORMATS = ('csv', 'ndjson')
+STATIC_COLUMNS = ('name', 'email', 'phone_number')
+
+
+def detect_format(filename):
+    # Guess the import format from the file extension
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def parse_csv(stream):
+    # Static columns map to Employee fields, every other non-empty column is a custom field
+    reader = csv.DictReader(stream)
+    for row in reader:
+        data = {column: row.get(column, '') for column in STATIC_COLUMNS}
+        data['custom_fields'] = {
+            key: value for key, value in row.items()
+            if key not in STATIC_COLUMNS and key is not None and value not in (None, '')
+        }
+        yield reader.line_num, data
+
+
+def parse_ndjson(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, {'__error__': f'Invalid JSON: {e}'}
+            continue
+        if not isinstance(data, dict):
+            data = {'__error__': 'Each line must be a JSON object.'}
+        yield line_number, data
+
+
+def validate_rows(rows, context):
+    # Yields (line_number, raw_row, validated_data, errors), exactly one of the last two is set
+    for line_number, row in rows:
+        if '__error__' in row:
+            yield line_number, row, None, {'non_field_errors': [row['__error__']]}
+            continue
+        serializer = BulkEmployeeSerializer(data=row, context=context)
+        if serializer.is_valid():
+            yield line_number, row, serializer.validated_data, None
+        else:
+            yield line_number, row, None, serializer.errors
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def dedupe_batch(batch):
+    # Rejects emails repeated inside the batch or already stored, one query per batch
+    emails = [data['email'] for _, _, data, errors in batch if errors is None]
+    existing = set(Employee.objects.filter(email__in=emails).values_list('email', flat=True))
+    for line_number, row, data, errors in batch:
+        if errors is None and data['email'] in existing:
+            errors, data = {'email': ['employee with this email already exists.']}, None
+        elif errors is None:
+            existing.add(data['email'])
+        yield line_number, row, data, errors
+
+
+def import_employees(user, stream, file_format, batch_size=IMPORT_BATCH_SIZE, on_progress=None, on_reject=None):
+    """
+    Stream employees from a text stream into the user's employee list.
+
+    Rows flow through parse -> validate -> dedupe -> batched insert, so memory is bounded
+    by the batch size rather than the file size. on_reject(line_number, row, errors) is
+    called for every rejected row and on_progress(summary) after every batch.
+    """
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+    context = {'custom_field_validators': get_custom_field_validators(user.id)}
+    rows = parse_csv(stream) if file_format == 'csv' else parse_ndjson(stream)
+    summary = {'processed': 0, 'created': 0, 'rejected': 0}
+
+    for batch in batched(validate_rows(rows, context), batch_size):
+        employees = []
+        for line_number, row, data, errors in dedupe_batch(batch):
+            if errors is None:
+                employees.append(Employee(user=user, **data))
+                continue
+            summary['rejected'] += 1
+            if on_reject is not None:
+                on_reject(line_number, row, errors)
+
+        # Each batch commits on its own so locks and memory stay bounded
+        with transaction.atomic():
+            Employee.objects.bulk_create(employees, batch_size=batch_size)
+            record_changes(user, EmployeeChange.UPSERT, [employee.id for employee in employees])
+        # After every commit, so cached lists and ETags never outlive stored rows whoever imports
+        if employees:
+            bump_collection_version(user.id)
+
+        summary['processed'] += len(batch)
+        summary['created'] += len(employees)
+        if on_progress is not None:
+            on_progress(dict(summary))
+
+    return summary
+
+
+def text_stream(binary_file):
+    # utf-8-sig drops the BOM spreadsheet exports put in front of CSV headers
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
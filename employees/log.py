@@ -0,0 +1,121 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+# LogRecord attributes that are not user supplied extra fields
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+REDACTED = '[redacted]'
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message, plus every `extra` field.
+
+    Values of keys in `redact` are replaced at any depth, callables in `extra` are
+    called here, so payloads are only built for records that actually get written.
+    """
+
+    def __init__(self, redact=(), **kwargs):
+        super().__init__(**kwargs)
+        self.redact = {key.lower() for key in redact}
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = self.clean(key, value() if callable(value) else value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+    def clean(self, key, value):
+        if key.lower() in self.redact:
+            return REDACTED
+        if isinstance(value, dict):
+            return {k: self.clean(k, v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.clean('', v) for v in value]
+        return value
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps `rate` of the records below WARNING, warnings and errors are always kept
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Hands records to a background thread that formats and writes them.
+
+    The request thread only filters and enqueues. Formatting, redaction and the file
+    writes (rotated at `max_bytes`) happen on the listener thread. When the queue is
+    full records are dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, filename=None, max_bytes=10 * 1024 * 1024, backup_count=5, console=True,
+                 queue_size=10000, sample_rate=1.0, redact=()):
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.addFilter(SamplingFilter(sample_rate))
+
+        formatter = JSONFormatter(redact=redact)
+        targets = []
+        if filename:
+            targets.append(RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True))
+        if console:
+            targets.append(logging.StreamHandler(sys.stderr))
+        for target in targets:
+            target.setFormatter(formatter)
+
+        self.listener = QueueListener(self.queue, *targets, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Unlike QueueHandler.prepare, don't format here, only capture what could change
+        # or be lost before the listener gets to it
+        record = logging.makeLogRecord(vars(record))
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def stop(self):
+        # Writes out what is still queued, safe to call more than once
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        for target in self.listener.handlers:
+            target.close()
+        super().close()
@@ -0,0 +1,164 @@
+import json
+import socket
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import override_settings
+from employees.benchmark import (
+    SCENARIOS, ClientDriver, HTTPDriver, cleanup, compare, run_scenario, run_serialization, run_wire_formats, seed,
+)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_wsgi_server():
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def start_asgi_server():
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError('--server asgi needs uvicorn (pip install uvicorn).')
+    from django.core.asgi import get_asgi_application
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(get_asgi_application(), host='127.0.0.1', port=port,
+                                           log_level='warning', lifespan='off'))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise CommandError('The ASGI server did not start.')
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return f'http://127.0.0.1:{port}', stop
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users, employees and custom fields, then measure latency percentiles, queries per request '
+        'and memory of the employee and auth APIs. The seeded data is removed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--allow-write', metavar='DATABASE', required=True,
+                            help='Name of the default database, confirms the seed data may be written to it.')
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--employees', type=int, default=1000, help='Employees per user.')
+        parser.add_argument('--custom-fields', type=int, default=5, help='Custom fields per user.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'Comma separated, from: {", ".join(SCENARIOS)}.')
+        parser.add_argument('--server', choices=('client', 'wsgi', 'asgi'), default='client',
+                            help='Django test client, or a threaded WSGI / uvicorn ASGI server in this process.')
+        parser.add_argument('--url', help='Benchmark an already running server instead, data is still seeded here.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel requests against a server.')
+        parser.add_argument('--tracemalloc', action='store_true', help='Report the traced Python memory peak, slows requests down.')
+        parser.add_argument('--serialization', type=int, default=0, metavar='ROWS',
+                            help='Also time serializing a page of this many employees, old path against the fast path.')
+        parser.add_argument('--accept-encoding', help='Accept-Encoding sent with every request, e.g. gzip or zstd.')
+        parser.add_argument('--accept', help='Accept sent with every request, e.g. application/msgpack.')
+        parser.add_argument('--wire-formats', type=int, default=0, metavar='ROWS',
+                            help='Also report bytes and CPU time of a page of this many employees per format and encoding.')
+        parser.add_argument('--json', help='Write the results to this file.')
+        parser.add_argument('--compare', help='Results file of an earlier run, fail on p95 regressions.')
+        parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed p95 slowdown against --compare.')
+
+    def handle(self, *args, **options):
+        # Seeding and the write scenarios change the database, the name guards against a production one
+        database = str(connection.settings_dict['NAME'])
+        if options['allow_write'] != database:
+            raise CommandError(f'bench writes to the default database {database!r}, pass --allow-write {database} '
+                               f'to run it there. Point the settings at a scratch database otherwise.')
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        if 'stats' in scenarios and options['custom_fields'] < 1:
+            raise CommandError('The stats scenario needs --custom-fields 1 or more, the first one is numeric.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        self.stdout.write(f"Seeding {options['users']} users x {options['employees']} employees, "
+                          f"{options['custom_fields']} custom fields each")
+        data = seed(options['users'], options['employees'], options['custom_fields'])
+        headers = {}
+        if options['accept_encoding']:
+            headers['Accept-Encoding'] = options['accept_encoding']
+        if options['accept']:
+            headers['Accept'] = options['accept']
+        stop_server = None
+        results = {}
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver', '127.0.0.1', 'localhost']):
+                if options['url']:
+                    driver = HTTPDriver(options['url'], headers)
+                elif options['server'] == 'wsgi':
+                    base_url, stop_server = start_wsgi_server()
+                    driver = HTTPDriver(base_url, headers)
+                elif options['server'] == 'asgi':
+                    base_url, stop_server = start_asgi_server()
+                    driver = HTTPDriver(base_url, headers)
+                else:
+                    driver = ClientDriver(headers)
+
+                for scenario in scenarios:
+                    results[scenario] = result = run_scenario(
+                        driver, data, scenario, options['requests'],
+                        concurrency=options['concurrency'], trace_memory=options['tracemalloc'],
+                    )
+                    self.stdout.write(
+                        f"{scenario:<9} {result['rps']:>8} req/s  p50 {result['p50_ms']:>8}ms  p95 {result['p95_ms']:>8}ms  "
+                        f"p99 {result['p99_ms']:>8}ms  queries {result['queries_per_request']}  "
+                        f"errors {result['errors']}  bytes {result['response_bytes']}  "
+                        f"cpu {result['cpu_ms_per_request']}ms  rss {result['max_rss_mb']}MB"
+                    )
+                if options['serialization']:
+                    results['serialization'] = result = run_serialization(data, options['serialization'])
+                    self.stdout.write(
+                        f"serialize {result['rows']} rows: serializer {result['serializer_rows_per_sec']} rows/s  "
+                        f"fast {result['fast_rows_per_sec']} rows/s  x{result['speedup']}  identical {result['identical']}"
+                    )
+                if options['wire_formats']:
+                    results['wire_formats'] = result = run_wire_formats(data, options['wire_formats'])
+                    for name, measured in result['formats'].items():
+                        self.stdout.write(f"page of {result['rows']} rows as {name:<17} {measured['bytes']:>10} bytes  "
+                                          f"cpu {measured['cpu_ms']}ms")
+        finally:
+            if stop_server:
+                stop_server()
+            cleanup(data)
+
+        report = {
+            'config': {key: options[key] for key in (
+                'users', 'employees', 'custom_fields', 'requests', 'server', 'url', 'concurrency', 'accept_encoding', 'accept',
+            )},
+            'results': results,
+        }
+        if options['json']:
+            with open(options['json'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+            self.stdout.write(f"Results written to {options['json']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['max_regression'])
+            for scenario, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f'{scenario}: p95 {before}ms -> {after}ms'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} scenarios regressed by more than {options["max_regression"]:.0%}.')
+            self.stdout.write(self.style.SUCCESS('No p95 regressions against the baseline.'))
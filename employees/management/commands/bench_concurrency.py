@@ -0,0 +1,94 @@
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from employees.models import Employee
+from user_account.models import CustomUser
+from user_account.utils import get_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        'Send many concurrent employee list requests through the ASGI application and report '
+        'throughput, latency and thread usage for API_MODE=sync and API_MODE=async.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests in flight at once.')
+        parser.add_argument('--employees', type=int, default=100, help='Employees in the listed collection.')
+        parser.add_argument('--mode', choices=('both', 'sync', 'async'), default='both')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'both':
+            # The mode is fixed when the URLconf loads, each one runs in its own process
+            for mode in ('sync', 'async'):
+                self.stdout.write(f'API_MODE={mode}')
+                result = subprocess.run(
+                    [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_concurrency',
+                     '--mode', mode, '--requests', str(options['requests']), '--employees', str(options['employees'])],
+                    env=dict(os.environ, API_MODE=mode), capture_output=True, text=True,
+                )
+                self.stdout.write(result.stdout)
+                if result.returncode:
+                    raise CommandError(result.stderr)
+            return
+
+        if settings.API_MODE != options['mode']:
+            raise CommandError(f"API_MODE is '{settings.API_MODE}', run with API_MODE={options['mode']}.")
+
+        user = CustomUser.objects.create_user(
+            email=f'bench-concurrency-{uuid.uuid4().hex}@example.com', name='Concurrency benchmark', password=None,
+        )
+        try:
+            Employee.objects.bulk_create(
+                Employee(user=user, name=f'Employee {i}', email=f'{uuid.uuid4().hex}@example.com', phone_number=str(i))
+                for i in range(options['employees'])
+            )
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                results, elapsed, peak_threads = asyncio.run(self.run(get_tokens(user)['access'], options['requests']))
+        finally:
+            user.delete()
+
+        latencies = sorted(latency for status_code, latency in results if status_code == 200)
+        failed = len(results) - len(latencies)
+        if not latencies:
+            raise CommandError(f'All {failed} requests failed.')
+
+        self.stdout.write(f'requests:        {len(results)} in {elapsed:.2f}s, {failed} failed')
+        self.stdout.write(f'latency p50/p99: {statistics.median(latencies) * 1000:.1f}ms / '
+                          f'{latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f}ms')
+        self.stdout.write(f'peak threads:    {peak_threads}')
+        self.stdout.write(self.style.SUCCESS(f'{len(results) / elapsed:.1f} requests/sec'))
+
+    async def run(self, access, count):
+        # Goes through Django's ASGI handler and middleware, like a server would
+        client = AsyncClient()
+        headers = {'authorization': f'Bearer {access}'}
+        peak_threads = threading.active_count()
+        done = asyncio.Event()
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while not done.is_set():
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.01)
+
+        async def request():
+            started = time.perf_counter()
+            response = await client.get('/employee/api/employees/', headers=headers)
+            return response.status_code, time.perf_counter() - started
+
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request() for _ in range(count)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await sampler
+        return results, elapsed, peak_threads
@@ -0,0 +1,15 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from employees.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete old entries of the employee changes feed. Mirrors behind them have to resync from an export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Keep changes of the last N days.')
+
+    def handle(self, *args, **options):
+        deleted = compact_changes(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entries'))
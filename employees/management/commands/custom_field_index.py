@@ -0,0 +1,97 @@
+import hashlib
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from user_account.models import CustomUser
+from employees.models import Employee
+from employees.partitioning import partitioning_info, user_partition
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or drop PostgreSQL indexes for hot custom fields. An expression index on '
+        'custom_fields -> <field> serves ?cf.<field>__gt/gte/lt/lte/in filters and ordering, '
+        'the GIN jsonb_path_ops index serves exact ?cf.<field>= filters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['create', 'drop', 'list'])
+        parser.add_argument('--field', help='Custom field name for an expression index.')
+        parser.add_argument('--user', help='Email of a user, limits the index to that user\'s employees.')
+        parser.add_argument('--gin', action='store_true', help='Use the GIN jsonb_path_ops index over all custom fields.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Custom field indexes are only supported on PostgreSQL.')
+
+        table = Employee._meta.db_table
+        method, partitions = partitioning_info(connection)
+        if options['action'] == 'list':
+            tables = [table] + [partition for partition, _, _ in partitions]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = ANY(%s) AND indexname LIKE 'employee_cf_%%' "
+                    "ORDER BY indexname",
+                    [tables],
+                )
+                for name, definition in cursor.fetchall():
+                    self.stdout.write(f'{name}: {definition}')
+            return
+
+        if options['gin'] == bool(options['field']):
+            raise CommandError('Pass either --field or --gin.')
+
+        user_id = None
+        if options['user']:
+            try:
+                user_id = CustomUser.objects.get(email=options['user']).id
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User not found: {options['user']}")
+
+        # CONCURRENTLY keeps the table writable but cannot run inside a transaction
+        with connection.schema_editor(atomic=False) as editor:
+            if options['gin']:
+                name = f"employee_cf_{user_id or 'all'}_gin"
+                columns = 'USING gin ("custom_fields" jsonb_path_ops)'
+            else:
+                digest = hashlib.md5(options['field'].encode()).hexdigest()[:8]
+                name = f"employee_cf_{user_id or 'all'}_{digest}"
+                key = editor.quote_value(options['field'])
+                # The global index leads with user_id because every query is scoped by user
+                columns = f'(("custom_fields" -> {key}))' if user_id else f'("user_id", ("custom_fields" -> {key}))'
+
+            if options['action'] == 'drop':
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [name])
+                    row = cursor.fetchone()
+                # An index on a partitioned table can't be dropped concurrently, dropping it is
+                # a catalog change though, its partitions' indexes go with it
+                concurrently = '' if row and row[0] == 'I' else 'CONCURRENTLY '
+                editor.execute(f'DROP INDEX {concurrently}IF EXISTS {editor.quote_name(name)}')
+                self.stdout.write(self.style.SUCCESS(f'Dropped index {name}'))
+                return
+
+            where = f' WHERE "user_id" = {int(user_id)}' if user_id else ''
+            if method and user_id:
+                # Only the user's partition holds their employees
+                table = user_partition(connection, user_id)
+                if table is None:
+                    raise CommandError(f"No partition holds the employees of {options['user']}.")
+            elif method:
+                # CONCURRENTLY doesn't work on a partitioned table: the parent's index is created
+                # invalid ON ONLY, each partition's index is built concurrently and attached to it
+                editor.execute(f'CREATE INDEX IF NOT EXISTS {editor.quote_name(name)} ON ONLY {editor.quote_name(table)} {columns}')
+                for partition, _, _ in partitions:
+                    partition_index = f'{name}_{partition[len(table) + 1:]}'
+                    editor.execute(
+                        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {editor.quote_name(partition_index)} '
+                        f'ON {editor.quote_name(partition)} {columns}'
+                    )
+                    editor.execute(f'ALTER INDEX {editor.quote_name(name)} ATTACH PARTITION {editor.quote_name(partition_index)}')
+                self.stdout.write(self.style.SUCCESS(f'Created index {name} on {len(partitions)} partitions'))
+                return
+
+            editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {editor.quote_name(name)} '
+                f'ON {editor.quote_name(table)} {columns}{where}'
+            )
+            self.stdout.write(self.style.SUCCESS(f'Created index {name}'))
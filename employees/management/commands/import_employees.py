@@ -0,0 +1,52 @@
+import csv
+import json
+from django.core.management.base import BaseCommand, CommandError
+from user_account.models import CustomUser
+from employees.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, detect_format, import_employees
+
+
+class Command(BaseCommand):
+    help = 'Stream employees from a CSV or NDJSON file into a user\'s employee list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import.')
+        parser.add_argument('--user', required=True, help='Email of the user that owns the employees.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='File format, guessed from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--rejects', help='Write rejected rows with their errors to this CSV file.')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User not found: {options['user']}")
+
+        file_format = options['format'] or detect_format(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot guess the file format, pass --format.')
+
+        rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8') if options['rejects'] else None
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        if rejects:
+            rejects.writerow(['line', 'errors', 'row'])
+
+        def on_reject(line_number, row, errors):
+            if rejects:
+                rejects.writerow([line_number, json.dumps(errors), json.dumps(row)])
+
+        def on_progress(summary):
+            self.stdout.write('Processed {processed} rows: {created} created, {rejected} rejected'.format(**summary))
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                summary = import_employees(
+                    user, stream, file_format, batch_size=options['batch_size'],
+                    on_progress=on_progress, on_reject=on_reject,
+                )
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Import finished: {created} created, {rejected} rejected'.format(**summary)
+        ))
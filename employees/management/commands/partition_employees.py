@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from user_account.models import CustomUser
+from employees.partitioning import (
+    EMPLOYEE_HASH_PARTITIONS, EMPLOYEE_PARTITIONING, PARTITION_METHODS,
+    abort_conversion, convert_to_partitions, create_user_partition, partitioning_info,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Partition the PostgreSQL employee table on user_id while it stays in use. "convert" copies the '
+        'employees into a hash or list partitioned table in batches, mirroring concurrent writes, and swaps '
+        'the tables under a short lock. "user" gives a user their own list partition, "status" lists the partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['convert', 'abort', 'user', 'status'])
+        parser.add_argument('--method', choices=PARTITION_METHODS, default=EMPLOYEE_PARTITIONING or 'hash')
+        parser.add_argument('--partitions', type=int, default=EMPLOYEE_HASH_PARTITIONS, help='Number of hash partitions.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows copied per transaction.')
+        parser.add_argument('--lock-timeout', default='5s', help='How long the final swap waits for its lock.')
+        parser.add_argument('--user', help='Email of the user that gets their own partition.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Employee partitioning is only supported on PostgreSQL.')
+
+        if options['action'] == 'status':
+            method, partitions = partitioning_info(connection)
+            if method is None:
+                self.stdout.write('The employee table is not partitioned.')
+            else:
+                self.stdout.write(f'{method} partitioned, {len(partitions)} partitions:')
+            for name, bound, rows in partitions:
+                self.stdout.write(f'  {name}: {bound}, ~{max(rows, 0)} rows')
+            return
+
+        if options['action'] == 'abort':
+            abort_conversion(connection)
+            self.stdout.write(self.style.SUCCESS('Dropped the partitioned copy, the employee table is unchanged.'))
+            return
+
+        try:
+            if options['action'] == 'user':
+                if not options['user']:
+                    raise CommandError('Pass --user.')
+                try:
+                    user_id = CustomUser.objects.get(email=options['user']).id
+                except CustomUser.DoesNotExist:
+                    raise CommandError(f"User not found: {options['user']}")
+                if create_user_partition(connection, user_id):
+                    self.stdout.write(self.style.SUCCESS(f"Moved {options['user']} to their own partition"))
+                else:
+                    self.stdout.write(f"{options['user']} already has their own partition")
+                return
+
+            def on_progress(copied, last_id):
+                self.stdout.write(f'Copied {copied} employees (through id {last_id})')
+
+            copied = convert_to_partitions(
+                connection, options['method'], options['partitions'], options['batch_size'],
+                options['lock_timeout'], on_progress=on_progress,
+            )
+        except (ValueError, DatabaseError) as e:
+            # The copy is kept, running convert again resumes it
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Employee table is now {options['method']} partitioned on user_id ({copied} rows copied)"
+        ))
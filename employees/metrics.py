@@ -0,0 +1,165 @@
+import contextvars
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+from .cache import cache_metrics
+from .db_metrics import database_metrics
+from .log import QueueLogHandler
+
+
+# Per process, each worker serves its own /metrics
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    # Cumulative buckets per label set, like a Prometheus client histogram
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{_labels(key, le=bound)} {count}')
+                lines.append(f'{self.name}_bucket{_labels(key, le="+Inf")} {series["count"]}')
+                lines.append(f'{self.name}_sum{_labels(key)} {series["sum"]}')
+                lines.append(f'{self.name}_count{_labels(key)} {series["count"]}')
+        return lines
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency.', DURATION_BUCKETS)
+REQUEST_QUERIES = Histogram('http_request_db_queries', 'SQL queries per request.', QUERY_BUCKETS)
+REQUEST_DB_DURATION = Histogram('http_request_db_duration_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+REQUEST_SERIALIZER_DURATION = Histogram(
+    'http_request_serializer_duration_seconds', 'Time spent serializing and rendering JSON per request.', DURATION_BUCKETS,
+)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size.', SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION, REQUEST_SERIALIZER_DURATION, RESPONSE_SIZE)
+
+
+class RequestStats:
+    # What one request spent, filled in by the SQL hook, the timed serializers and the JSON renderer
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.sql = [] if capture_sql else None
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        if self.sql is not None and len(self.sql) < 100:
+            self.sql.append({'sql': sql, 'ms': round(duration * 1000, 2)})
+
+
+current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def _query_hook(execute, sql, params, many, context):
+    # Installed on every connection, contextvars follow the request into sync_to_async
+    # threads, so queries of async views are counted too
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def _install_query_hook(sender, connection, **kwargs):
+    if _query_hook not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _query_hook)
+
+
+class TimedSerializerMixin:
+    # Adds the time spent in .data to the current request's serializer time
+
+    @property
+    def data(self):
+        stats = current_stats.get()
+        if stats is None:
+            return super().data
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+def _counter(lines, name, help_text, value, kind='counter', **labels):
+    if f'# HELP {name} {help_text}' not in lines:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    lines.append(f'{name}{_labels(tuple(labels.items()))} {value}')
+
+
+def render_metrics():
+    """Prometheus text exposition of the request histograms and the process' cache, database and log counters."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+
+    for name, value in cache_metrics().items():
+        _counter(lines, f'employee_cache_{name}_total', f'Employee response cache {name}.', value)
+
+    for alias, entry in database_metrics().items():
+        _counter(lines, 'db_connects_total', 'Connection setups, pool checkouts when pooled.', entry['connects'], alias=alias)
+        for stat, value in entry.get('pool', {}).items():
+            _counter(lines, f'db_pool_{stat}', f'psycopg pool {stat}.', value, kind='gauge', alias=alias)
+
+    for handler in logging.getLogger('employees.view').handlers:
+        if isinstance(handler, QueueLogHandler):
+            _counter(lines, 'log_records_dropped_total', 'Log records dropped on a full queue.', handler.dropped)
+            _counter(lines, 'log_queue_size', 'Log records waiting to be written.', handler.queue.qsize(), kind='gauge')
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    # Optionally protected with METRICS_TOKEN, sent as "Authorization: Bearer <token>"
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,135 @@
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from .compression import acompress_stream, compress, compress_stream, negotiate_encoding
+from .metrics import (
+    REQUEST_DB_DURATION, REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SERIALIZER_DURATION, RESPONSE_SIZE,
+    RequestStats, current_stats,
+)
+
+
+logger = logging.getLogger('employees.view')
+
+# URL trees that are measured, others (admin, /metrics itself) pass through untouched
+METRICS_PATH_PREFIXES = getattr(settings, 'METRICS_PATH_PREFIXES', ('/employee/', '/auth/'))
+
+# Requests slower than this are logged with their SQL, 0 turns it off
+SLOW_REQUEST_MS = getattr(settings, 'SLOW_REQUEST_MS', 0)
+
+# Smaller bodies are sent as is, compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, SQL query count and time, serializer time and response size per route.
+
+    Routes are labelled with the URL name, so the histograms stay bounded no matter how
+    many ids are requested. Works for sync and async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith(METRICS_PATH_PREFIXES):
+            return self.get_response(request)
+
+        stats, started, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith(METRICS_PATH_PREFIXES):
+            return await self.get_response(request)
+
+        stats, started, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    def start(self):
+        stats = RequestStats(capture_sql=bool(SLOW_REQUEST_MS))
+        return stats, time.perf_counter(), current_stats.set(stats)
+
+    def finish(self, request, response, stats, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else '<unmatched>'
+        labels = {'route': route, 'method': request.method}
+
+        REQUEST_DURATION.observe(dict(labels, status=response.status_code), duration)
+        REQUEST_QUERIES.observe(labels, stats.queries)
+        REQUEST_DB_DURATION.observe(labels, stats.db_time)
+        REQUEST_SERIALIZER_DURATION.observe(labels, stats.serializer_time)
+        if not response.streaming:
+            # DRF responses are rendered by now, the template response middleware ran inside
+            RESPONSE_SIZE.observe(labels, len(response.content))
+
+        if SLOW_REQUEST_MS and duration * 1000 >= SLOW_REQUEST_MS:
+            logger.warning('Slow request: %s %s took %.0fms', request.method, request.path, duration * 1000, extra={
+                'route': route,
+                'status': response.status_code,
+                'queries': stats.queries,
+                'db_ms': round(stats.db_time * 1000, 2),
+                'serializer_ms': round(stats.serializer_time * 1000, 2),
+                'sql': stats.sql,
+            })
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses with zstd, brotli or gzip, negotiated from Accept-Encoding.
+
+    Like Django's GZipMiddleware, but with the encodings that are installed (see
+    compression.py) and a size threshold. Streamed responses (exports) are always
+    compressed, chunk by chunk.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is another representation, a strong ETag would claim the same bytes
+        etag = response.headers.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
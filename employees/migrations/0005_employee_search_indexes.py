@@ -0,0 +1,38 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# Expression indexes matching the SQL Django emits for the search lookups:
+# icontains -> UPPER("col"::text) LIKE UPPER(...), startswith -> "col"::text LIKE ...
+SEARCH_INDEXES = [
+    ('employee_name_trgm', 'USING gin (UPPER("name"::text) gin_trgm_ops)'),
+    ('employee_email_trgm', 'USING gin (UPPER("email"::text) gin_trgm_ops)'),
+    ('employee_phone_prefix', '(("phone_number"::text) text_pattern_ops)'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Only Postgres has these index types, other backends keep plain LIKE scans
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "employees_employee" {definition}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_employee_custom_fields'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
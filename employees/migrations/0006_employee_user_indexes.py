@@ -0,0 +1,71 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_custom_fields(apps, schema_editor):
+    # The unique constraint needs one row per (user, field_name). Employee values are keyed
+    # by name, so copies of the same definition merge onto the oldest row without losing
+    # anything. Copies that disagree on field_type would need a decision, nothing is changed
+    CustomField = apps.get_model('employees', 'CustomField')
+    duplicates = (
+        CustomField.objects.values('user', 'field_name')
+        .annotate(keep_id=models.Min('id'), total=models.Count('id'), types=models.Count('field_type', distinct=True))
+        .filter(total__gt=1)
+        .order_by('user', 'field_name')
+    )
+    conflicts = [duplicate for duplicate in duplicates if duplicate['types'] > 1]
+    if conflicts:
+        listed = '\n'.join(
+            f"  user {duplicate['user']}, {duplicate['field_name']!r}: " + ', '.join(
+                f'id {field_id} ({field_type})' for field_id, field_type in CustomField.objects.filter(
+                    user=duplicate['user'], field_name=duplicate['field_name'],
+                ).order_by('id').values_list('id', 'field_type')
+            )
+            for duplicate in conflicts
+        )
+        raise ValueError(
+            'These custom fields are defined more than once with different types, delete the wrong '
+            f'definitions and migrate again:\n{listed}'
+        )
+    for duplicate in duplicates:
+        CustomField.objects.filter(
+            user=duplicate['user'], field_name=duplicate['field_name']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_employee_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # Composite indexes are created before the single column user indexes are dropped
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['user', 'id'], name='employee_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['user', 'name', 'id'], name='employee_user_name_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_custom_fields, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customfield',
+            constraint=models.UniqueConstraint(fields=('user', 'field_name'), name='customfield_user_field_name_uniq'),
+        ),
+        migrations.AlterField(
+            model_name='customfield',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
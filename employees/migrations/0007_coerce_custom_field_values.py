@@ -0,0 +1,74 @@
+import math
+
+from django.db import migrations
+
+
+def to_number(value):
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            number = float(value.strip())
+            if not math.isfinite(number):
+                raise ValueError(value)
+            return int(number) if number.is_integer() else number
+    return value
+
+
+def to_boolean(value):
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ('true', '1', 'yes', 'on'):
+            return True
+        if text in ('false', '0', 'no', 'off'):
+            return False
+    return value
+
+
+COERCERS = {'number': to_number, 'boolean': to_boolean}
+
+
+def coerce_stored_values(apps, schema_editor):
+    # Earlier versions stored every custom field value as sent, e.g. {'experience': '21'}.
+    # Rewrite number/boolean values as native JSON, values that do not parse are left alone.
+    CustomField = apps.get_model('employees', 'CustomField')
+    Employee = apps.get_model('employees', 'Employee')
+
+    typed_fields = {}
+    for user_id, field_name, field_type in CustomField.objects.filter(
+        field_type__in=COERCERS
+    ).values_list('user_id', 'field_name', 'field_type'):
+        typed_fields.setdefault(user_id, {})[field_name] = COERCERS[field_type]
+
+    for user_id, coercers in typed_fields.items():
+        batch = []
+        employees = Employee.objects.filter(user_id=user_id).only('id', 'custom_fields')
+        for employee in employees.iterator(chunk_size=1000):
+            changed = False
+            for field_name, coerce in coercers.items():
+                value = employee.custom_fields.get(field_name)
+                try:
+                    coerced = coerce(value)
+                except (ValueError, OverflowError):
+                    continue
+                if coerced is not value:
+                    employee.custom_fields[field_name] = coerced
+                    changed = True
+            if changed:
+                batch.append(employee)
+            if len(batch) >= 1000:
+                Employee.objects.bulk_update(batch, ['custom_fields'])
+                batch = []
+        if batch:
+            Employee.objects.bulk_update(batch, ['custom_fields'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_employee_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(coerce_stored_values, migrations.RunPython.noop),
+    ]
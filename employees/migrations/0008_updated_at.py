@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0007_coerce_custom_field_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customfield',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def partition_new_employee_table(apps, schema_editor):
+    # With EMPLOYEE_PARTITIONING set, a new PostgreSQL database starts out partitioned.
+    # Only the schema changes here: a table that already holds employees is left alone,
+    # its rows are copied online by python manage.py partition_employees convert
+    # The unique email column becomes the (user_id, email) constraint plus the email guard
+    # table that keeps email unique across users, see employees/partitioning.py
+    from employees.partitioning import EMPLOYEE_HASH_PARTITIONS, partition_empty_table
+
+    method = getattr(settings, 'EMPLOYEE_PARTITIONING', '')
+    if schema_editor.connection.vendor != 'postgresql' or not method:
+        return
+    partition_empty_table(schema_editor.connection, method, EMPLOYEE_HASH_PARTITIONS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_employee_change_log'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='employee',
+            constraint=models.UniqueConstraint(fields=('user', 'email'), name='employee_user_email_uniq'),
+        ),
+        # The guard table is created along with the partitions, if at all
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='EmployeeEmailGuard',
+                    fields=[
+                        ('email', models.EmailField(max_length=254, primary_key=True, serialize=False)),
+                    ],
+                    options={
+                        'db_table': 'employees_employee_email_guard',
+                        'managed': False,
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(partition_new_employee_table, migrations.RunPython.noop),
+            ],
+        ),
+    ]
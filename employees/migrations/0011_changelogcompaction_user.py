@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_employee_partitioning'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelogcompaction',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='changelogcompaction',
+            index=models.Index(fields=['user', 'compacted_through'], name='changecompaction_user_idx'),
+        ),
+    ]
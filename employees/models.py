@@ -2,20 +2,93 @@ from django.db import models
 from user_account.models import CustomUser  # Directly import the CustomUser model
 
 class Employee(models.Model):
-    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Indexed through the (user, ...) composite indexes below
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=100)
+    # With EMPLOYEE_PARTITIONING only the (user, email) constraint is left in the database,
+    # uniqueness across users is kept by EmployeeEmailGuard (see employees/partitioning.py)
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15)
     custom_fields = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Every query is scoped by user, ordered by id or name for pagination
+            models.Index(fields=['user', 'id'], name='employee_user_id_idx'),
+            models.Index(fields=['user', 'name', 'id'], name='employee_user_name_idx'),
+        ]
+        constraints = [
+            # Redundant next to the unique email column, the one a partitioned table can keep
+            models.UniqueConstraint(fields=['user', 'email'], name='employee_user_email_uniq'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class EmployeeEmailGuard(models.Model):
+    # One row per employee email, kept in step by a trigger on the partitioned employee table.
+    # Only exists once the table is partitioned, so Django never creates or queries it
+    email = models.EmailField(primary_key=True)
+
+    class Meta:
+        managed = False
+        db_table = 'employees_employee_email_guard'
+
+    def __str__(self):
+        return self.email
+
+
 class CustomField(models.Model):
-    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Indexed through the (user, field_name) unique constraint below
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False)
     field_name = models.CharField(max_length=100)
     field_type = models.CharField(max_length=50)  # e.g., 'text', 'number'
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'field_name'], name='customfield_user_field_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.field_name} ({self.field_type})"
+
+
+class EmployeeChange(models.Model):
+    # Append-only change log behind the changes feed, ids are the feed positions
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    FIELD_REMOVED = 'field_removed'
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False)
+    employee_id = models.BigIntegerField(null=True)  # No FK, tombstones outlive the employee
+    op = models.CharField(max_length=20)
+    field_name = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='employeechange_user_id_idx'),
+            models.Index(fields=['created_at'], name='employeechange_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.op} {self.employee_id or self.field_name}"
+
+
+class ChangeLogCompaction(models.Model):
+    # The user's changes up to compacted_through were deleted, older feed tokens must resync.
+    # Rows without a user cover every user
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, db_index=False)
+    compacted_through = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'compacted_through'], name='changecompaction_user_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.field_name} ({self.field_type})"
\ No newline at end of file
+        return f"compacted through {self.compacted_through}"
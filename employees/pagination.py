@@ -0,0 +1,104 @@
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class EmployeeCursorPagination(CursorPagination):
+    # Opaque keyset cursor, so page N costs the same as page 1
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+    # Sort keys a client may pick with ?ordering=, 'id' is always the tie breaker
+    ordering_query_param = 'ordering'
+    ordering_fields = ('id', 'name', 'email')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Keep the plain list response unless the client opts into cursor mode
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+
+        # DRF's cursor only holds the first sort key and skips ties with an offset. Here the
+        # position holds every sort key, ending in the unique id, so each page starts right
+        # after the row the cursor points at and offsets are never needed
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor:
+            # An offset from an older cursor would be applied on top of an exact position
+            self.cursor = self.cursor._replace(offset=0)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, self._decode_position(position)))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = following_position is not None, following_position
+        else:
+            self.has_next, self.next_position = following_position is not None, following_position
+            self.has_previous, self.previous_position = position is not None, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if not ordering:
+            return (self.ordering,)
+
+        field_name = ordering.lstrip('-')
+        if field_name.startswith('cf.'):
+            raise ValidationError({'ordering': 'Custom field ordering is not available with cursor pagination.'})
+        if field_name not in self.ordering_fields:
+            raise ValidationError({'ordering': f"Cannot order by '{field_name}'."})
+
+        if field_name == 'id':
+            return (ordering,)
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [instance[field.lstrip('-')] if isinstance(instance, dict) else getattr(instance, field.lstrip('-'))
+                  for field in ordering]
+        # A plain id stays a plain string, like the cursors DRF encodes
+        return str(values[0]) if len(values) == 1 else json.dumps(values)
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position) if len(self.ordering) > 1 else [position]
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(position)
+            # The last sort key is always the id
+            return [*values[:-1], int(values[-1])]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, ordering, values):
+        # (field, id) > (value, id) as field >= value AND (field > value OR id > id), the
+        # first condition bounds the index range scan on (user, field, id)
+        *keys, (id_field, id_value) = zip(ordering, values)
+        condition = Q(**{f"{id_field.lstrip('-')}__{'lt' if id_field.startswith('-') else 'gt'}": id_value})
+        for field, value in reversed(keys):
+            name, descending = field.lstrip('-'), field.startswith('-')
+            condition = (
+                Q(**{f"{name}__{'lte' if descending else 'gte'}": value})
+                & (Q(**{f"{name}__{'lt' if descending else 'gt'}": value}) | condition)
+            )
+        return condition
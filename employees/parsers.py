@@ -0,0 +1,14 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from .renderers import msgpack
+
+
+class MessagePackParser(BaseParser):
+    # application/msgpack request bodies, needs the msgpack package
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -0,0 +1,362 @@
+import hashlib
+import re
+from django.conf import settings
+from django.db import transaction
+from .models import Employee, EmployeeEmailGuard
+
+
+# Employee storage can be split per tenant with PostgreSQL declarative partitioning on
+# user_id. 'hash' spreads users over EMPLOYEE_HASH_PARTITIONS partitions, 'list' gives
+# each user their own partition (users without one share the default partition).
+# Queries are all scoped by user, so they only touch that user's partition.
+#
+# An existing table is converted online (convert_to_partitions): the partitioned table
+# is built next to it, a trigger mirrors every write while batches are copied over, and
+# a short exclusive lock swaps the two tables at the end.
+#
+# A partitioned table can't have a unique constraint without the partition key, so the
+# primary key becomes (id, user_id) and only the model's (user, email) constraint is kept.
+# Email stays unique across users through EMAIL_GUARD, a plain table keyed on email that a
+# trigger on the partitioned table keeps in step: a duplicate fails on its primary key with
+# an IntegrityError, as it did on the unique email column.
+#
+# Migration 0010 only partitions a new, empty table. Copying existing rows is left to
+# python manage.py partition_employees convert.
+
+PARTITION_METHODS = ('hash', 'list')
+EMPLOYEE_PARTITIONING = getattr(settings, 'EMPLOYEE_PARTITIONING', '')
+EMPLOYEE_HASH_PARTITIONS = getattr(settings, 'EMPLOYEE_HASH_PARTITIONS', 16)
+
+TABLE = Employee._meta.db_table
+NEW_TABLE = f'{TABLE}_partitioned'
+SEQUENCE = f'{TABLE}_id_seq'
+NEW_SEQUENCE = f'{NEW_TABLE}_id_seq'
+SYNC_FUNCTION = f'{NEW_TABLE}_sync'
+SYNC_TRIGGER = f'{NEW_TABLE}_sync_trigger'
+DEFAULT_PARTITION = f'{TABLE}_default'
+USER_EMAIL_CONSTRAINT = 'employee_user_email_uniq'
+EMAIL_GUARD = EmployeeEmailGuard._meta.db_table
+EMAIL_GUARD_FUNCTION = f'{EMAIL_GUARD}_sync'
+EMAIL_GUARD_TRIGGER = f'{EMAIL_GUARD}_trigger'
+
+COLUMNS = [field.column for field in Employee._meta.concrete_fields]
+
+_INDEX_DEFINITION = re.compile(r'^CREATE (UNIQUE )?INDEX (\S+) ON (\S+) (.*)$')
+_HASH_BOUND = re.compile(r'modulus (\d+), remainder (\d+)')
+
+
+def _temporary_index_name(name):
+    # Index names are unique per schema, the copies are renamed once the old table is gone.
+    # The hash keeps long names that share a prefix apart within the 63 character limit
+    digest = hashlib.md5(name.encode()).hexdigest()[:8]
+    return f'{name[:50]}_{digest}_new'
+
+
+def partitioning_info(connection, table=TABLE):
+    """
+    Return ('hash' | 'list' | None, [(partition, bound, estimated_rows)]) for the table.
+
+    Row counts are the planner's estimates from the last ANALYZE, -1 when never analyzed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT partstrat FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table])
+        row = cursor.fetchone()
+        if row is None:
+            return None, []
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname',
+            [table],
+        )
+        return {'h': 'hash', 'l': 'list'}[row[0]], cursor.fetchall()
+
+
+def user_partition(connection, user_id):
+    # The partition holding user_id's employees, None when the table isn't partitioned
+    method, partitions = partitioning_info(connection)
+    if method == 'list':
+        name = f'{TABLE}_u{int(user_id)}'
+        return name if any(partition == name for partition, _, _ in partitions) else DEFAULT_PARTITION
+    if method == 'hash':
+        with connection.cursor() as cursor:
+            for name, bound, _ in partitions:
+                modulus, remainder = map(int, _HASH_BOUND.search(bound).groups())
+                cursor.execute('SELECT satisfies_hash_partition(to_regclass(%s), %s, %s, %s::bigint)',
+                               [TABLE, modulus, remainder, user_id])
+                if cursor.fetchone()[0]:
+                    return name
+    return None
+
+
+def _table_exists(cursor, table):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [table])
+    return cursor.fetchone()[0]
+
+
+def _copied_indexes(cursor):
+    # (name, definition) of the secondary indexes of the old table, rewritten for the new one.
+    # The primary key and unique constraints are recreated with user_id instead
+    cursor.execute(
+        'SELECT i.indexname, i.indexdef FROM pg_indexes i WHERE i.tablename = %s AND i.indexname NOT IN '
+        '(SELECT c.relname FROM pg_constraint k JOIN pg_class c ON c.oid = k.conindid WHERE k.conrelid = to_regclass(%s))',
+        [TABLE, TABLE],
+    )
+    indexes = []
+    for name, definition in cursor.fetchall():
+        unique, _, _, rest = _INDEX_DEFINITION.match(definition).groups()
+        if unique and 'user_id' not in rest:
+            rest = rest.replace('(', '(user_id, ', 1)
+        indexes.append((name, f'CREATE {unique or ""}INDEX "{_temporary_index_name(name)}" ON "{NEW_TABLE}" {rest}'))
+    return indexes
+
+
+def _create_partitions(connection, cursor, method, partitions):
+    quote = connection.ops.quote_name
+    table = quote(NEW_TABLE)
+    if method == 'hash':
+        for remainder in range(partitions):
+            cursor.execute(
+                f'CREATE TABLE {quote(f"{TABLE}_p{remainder}")} PARTITION OF {table} '
+                f'FOR VALUES WITH (MODULUS {int(partitions)}, REMAINDER {remainder})'
+            )
+        return
+    cursor.execute(f'SELECT DISTINCT user_id FROM {quote(TABLE)} ORDER BY user_id')
+    for (user_id,) in cursor.fetchall():
+        cursor.execute(
+            f'CREATE TABLE {quote(f"{TABLE}_u{int(user_id)}")} PARTITION OF {table} '
+            f'FOR VALUES IN ({int(user_id)})'
+        )
+    cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT')
+
+
+def prepare_partitioned_table(connection, method, partitions=EMPLOYEE_HASH_PARTITIONS):
+    """
+    Create the empty partitioned copy of the employee table and the trigger that mirrors
+    every write on the old table into it. Does nothing when the copy already exists.
+    """
+    if method not in PARTITION_METHODS:
+        raise ValueError(f"Partitioning method must be one of: {', '.join(PARTITION_METHODS)}.")
+    quote = connection.ops.quote_name
+    column_list = ', '.join(quote(column) for column in COLUMNS)
+    new_values = ', '.join(f'NEW.{quote(column)}' for column in COLUMNS)
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if _table_exists(cursor, NEW_TABLE):
+            return False
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {quote(TABLE)}')
+        start = cursor.fetchone()[0]
+        cursor.execute(f'CREATE SEQUENCE {quote(NEW_SEQUENCE)} START WITH {int(start)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(NEW_TABLE)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS) '
+            f'PARTITION BY {method.upper()} (user_id)'
+        )
+        cursor.execute(f"ALTER TABLE {quote(NEW_TABLE)} ALTER id SET DEFAULT nextval('{NEW_SEQUENCE}')")
+        cursor.execute(f'ALTER SEQUENCE {quote(NEW_SEQUENCE)} OWNED BY {quote(NEW_TABLE)}.id')
+        _create_partitions(connection, cursor, method, partitions)
+
+        # Indexes go in before the copy, building them later would block the mirrored writes
+        cursor.execute(f'ALTER TABLE {quote(NEW_TABLE)} ADD CONSTRAINT {quote(f"{NEW_TABLE}_pkey")} PRIMARY KEY (id, user_id)')
+        # Constraint indexes are named per schema as well, the old table may hold this one still
+        cursor.execute(
+            f'ALTER TABLE {quote(NEW_TABLE)} ADD CONSTRAINT {quote(_temporary_index_name(USER_EMAIL_CONSTRAINT))} '
+            f'UNIQUE (user_id, email)'
+        )
+        for _, definition in _copied_indexes(cursor):
+            cursor.execute(definition)
+        cursor.execute(
+            f'ALTER TABLE {quote(NEW_TABLE)} ADD CONSTRAINT {quote(f"{TABLE}_user_id_fk")} FOREIGN KEY (user_id) '
+            f'REFERENCES {quote(Employee._meta.get_field("user").related_model._meta.db_table)} (id) '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+
+        # Filled by the copy like the partitions, an email only changes hands once it is released
+        email_column = Employee._meta.get_field('email')
+        cursor.execute(f'CREATE TABLE {quote(EMAIL_GUARD)} (email varchar({email_column.max_length}) PRIMARY KEY)')
+        cursor.execute(f'''
+            CREATE FUNCTION {quote(EMAIL_GUARD_FUNCTION)}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND NEW.email = OLD.email THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {quote(EMAIL_GUARD)} WHERE email = OLD.email;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {quote(EMAIL_GUARD)} (email) VALUES (NEW.email);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute(
+            f'CREATE TRIGGER {quote(EMAIL_GUARD_TRIGGER)} AFTER INSERT OR UPDATE OF email OR DELETE ON {quote(NEW_TABLE)} '
+            f'FOR EACH ROW EXECUTE FUNCTION {quote(EMAIL_GUARD_FUNCTION)}()'
+        )
+
+        # Updates are a delete and an insert, so a changed user_id moves the row to its partition
+        cursor.execute(f'''
+            CREATE FUNCTION {quote(SYNC_FUNCTION)}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {quote(NEW_TABLE)} WHERE id = OLD.id AND user_id = OLD.user_id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {quote(NEW_TABLE)} ({column_list}) VALUES ({new_values});
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute(
+            f'CREATE TRIGGER {quote(SYNC_TRIGGER)} AFTER INSERT OR UPDATE OR DELETE ON {quote(TABLE)} '
+            f'FOR EACH ROW EXECUTE FUNCTION {quote(SYNC_FUNCTION)}()'
+        )
+    return True
+
+
+def copy_rows(connection, batch_size=5000, on_progress=None):
+    """
+    Copy the old table into the partitioned one in id order, one transaction per batch.
+
+    Each batch takes FOR SHARE locks on the rows it copies, so a concurrent update or
+    delete either waits for the batch or is mirrored after it. Rows the trigger already
+    copied are skipped. Safe to run again after an interruption.
+    """
+    quote = connection.ops.quote_name
+    column_list = ', '.join(quote(column) for column in COLUMNS)
+    copied, last_id = 0, 0
+    while True:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT MAX(id) FROM (SELECT id FROM {quote(TABLE)} WHERE id > %s ORDER BY id LIMIT %s) batch',
+                [last_id, batch_size],
+            )
+            upper = cursor.fetchone()[0]
+            if upper is None:
+                return copied
+            cursor.execute(
+                f'INSERT INTO {quote(NEW_TABLE)} ({column_list}) SELECT {column_list} FROM {quote(TABLE)} '
+                f'WHERE id > %s AND id <= %s FOR SHARE ON CONFLICT (id, user_id) DO NOTHING',
+                [last_id, upper],
+            )
+            copied += cursor.rowcount
+        last_id = upper
+        if on_progress:
+            on_progress(copied, last_id)
+
+
+def swap_tables(connection, lock_timeout='5s'):
+    """
+    Replace the employee table with the partitioned copy.
+
+    Runs under an exclusive lock on the old table, which only waits `lock_timeout` for
+    running queries, the swap itself is catalog updates. The old table is dropped.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('SELECT set_config(%s, %s, true)', ['lock_timeout', lock_timeout])
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s', [NEW_TABLE])
+        created = {name for (name,) in cursor.fetchall()}
+        # Temporary name -> the old table's index name it takes over
+        renames = {
+            _temporary_index_name(name): name for name, _ in _copied_indexes(cursor)
+            if _temporary_index_name(name) in created
+        }
+
+        # Ids handed out by the old table's sequence stay taken
+        cursor.execute(f"SELECT setval('{NEW_SEQUENCE}', GREATEST((SELECT last_value FROM {quote(SEQUENCE)}), "
+                       f"(SELECT COALESCE(MAX(id), 0) FROM {quote(NEW_TABLE)}), 1))")
+        cursor.execute(f'DROP TABLE {quote(TABLE)}')
+        cursor.execute(f'DROP FUNCTION {quote(SYNC_FUNCTION)}()')
+        cursor.execute(f'ALTER TABLE {quote(NEW_TABLE)} RENAME TO {quote(TABLE)}')
+        cursor.execute(f'ALTER SEQUENCE {quote(NEW_SEQUENCE)} RENAME TO {quote(SEQUENCE)}')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME CONSTRAINT {quote(f"{NEW_TABLE}_pkey")} TO {quote(f"{TABLE}_pkey")}')
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} RENAME CONSTRAINT {quote(_temporary_index_name(USER_EMAIL_CONSTRAINT))} '
+            f'TO {quote(USER_EMAIL_CONSTRAINT)}'
+        )
+        for temporary_name, name in renames.items():
+            cursor.execute(f'ALTER INDEX {quote(temporary_name)} RENAME TO {quote(name)}')
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER id SET DEFAULT nextval('{SEQUENCE}')")
+
+
+def abort_conversion(connection):
+    # Drop an unfinished partitioned copy and its triggers, the old table is left as it was
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if not _table_exists(cursor, NEW_TABLE):
+            return
+        cursor.execute(f'DROP TRIGGER IF EXISTS {quote(SYNC_TRIGGER)} ON {quote(TABLE)}')
+        cursor.execute(f'DROP FUNCTION IF EXISTS {quote(SYNC_FUNCTION)}()')
+        cursor.execute(f'DROP TABLE {quote(NEW_TABLE)}')
+        cursor.execute(f'DROP FUNCTION IF EXISTS {quote(EMAIL_GUARD_FUNCTION)}()')
+        cursor.execute(f'DROP TABLE IF EXISTS {quote(EMAIL_GUARD)}')
+
+
+def convert_to_partitions(connection, method, partitions=EMPLOYEE_HASH_PARTITIONS, batch_size=5000,
+                          lock_timeout='5s', on_progress=None):
+    """
+    Convert the employee table to a table partitioned on user_id while it stays in use.
+
+    Runs prepare_partitioned_table(), copy_rows() and swap_tables(). An interrupted run
+    picks up where it stopped when started again, abort_conversion() undoes it instead.
+    """
+    if partitioning_info(connection)[0] is not None:
+        raise ValueError('The employee table is already partitioned.')
+    prepare_partitioned_table(connection, method, partitions)
+    copied = copy_rows(connection, batch_size, on_progress)
+    swap_tables(connection, lock_timeout)
+    return copied
+
+
+def partition_empty_table(connection, method, partitions=EMPLOYEE_HASH_PARTITIONS):
+    """
+    Partition the employee table while it holds no rows, nothing is copied.
+
+    Returns False and leaves the table alone when it has rows or is partitioned already.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias):
+        if partitioning_info(connection)[0] is not None:
+            return False
+        with connection.cursor() as cursor:
+            # Writes wait for the swap, so the table is still empty when it happens
+            cursor.execute(f'LOCK TABLE {quote(TABLE)} IN SHARE MODE')
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(TABLE)})')
+            if cursor.fetchone()[0]:
+                return False
+        prepare_partitioned_table(connection, method, partitions)
+        swap_tables(connection)
+    return True
+
+
+def create_user_partition(connection, user_id):
+    """
+    Move one user's employees out of the default list partition into their own.
+
+    The default partition is locked against writes for the whole move, so employees of
+    every user without their own partition wait for it. Reads go on until the attach.
+    """
+    quote = connection.ops.quote_name
+    method, partitions = partitioning_info(connection)
+    if method != 'list':
+        raise ValueError('Per user partitions need list partitioning.')
+    name = f'{TABLE}_u{int(user_id)}'
+    if any(partition == name for partition, _, _ in partitions):
+        return False
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # A row inserted for the user after the copy would be left in the default partition
+        # and fail the attach
+        cursor.execute(f'LOCK TABLE {quote(DEFAULT_PARTITION)} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)')
+        # Lets ATTACH skip scanning the new partition
+        cursor.execute(f'ALTER TABLE {quote(name)} ADD CONSTRAINT {quote(f"{name}_user_check")} CHECK (user_id = {int(user_id)})')
+        cursor.execute(f'INSERT INTO {quote(name)} SELECT * FROM {quote(DEFAULT_PARTITION)} WHERE user_id = %s', [user_id])
+        cursor.execute(f'DELETE FROM {quote(DEFAULT_PARTITION)} WHERE user_id = %s', [user_id])
+        # The delete released the emails in the guard, the new partition has no trigger until attached
+        cursor.execute(f'INSERT INTO {quote(EMAIL_GUARD)} (email) SELECT email FROM {quote(name)}')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES IN ({int(user_id)})')
+        cursor.execute(f'ALTER TABLE {quote(name)} DROP CONSTRAINT {quote(f"{name}_user_check")}')
+    return True
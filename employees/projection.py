@@ -0,0 +1,155 @@
+from django.db.models import Func, JSONField, Value
+from django.db.models.fields.json import KeyTransform, compile_json_path
+from rest_framework.exceptions import ValidationError
+from .filters import ORDERING_FIELDS
+from .schema import get_custom_field_validators
+from .serializer import EmployeeSerializer
+
+
+FIELDS_PARAM = 'fields'
+CUSTOM_FIELDS_PARAM = 'cf'
+EMPLOYEE_FIELDS = tuple(EmployeeSerializer.Meta.fields)
+
+# Alias of the selected custom_fields subset, an annotation can't reuse the field's name
+_CUSTOM_FIELDS_ALIAS = 'projected_custom_fields'
+
+
+class CustomFieldValues(Func):
+    # {key: value} of the listed custom_fields keys built in the database, so the rest of
+    # the JSON blob is never sent over the wire. Keys an employee has no value for are null.
+    # With boxed=True a present value comes as [value], which tells a stored null apart
+    # from a missing key.
+    function = 'JSONB_BUILD_OBJECT'
+    output_field = JSONField()
+    # Each key takes two arguments and PostgreSQL caps a call at 100 (SQLite at 127), so
+    # longer key lists are built in chunks and merged
+    keys_per_call = 40
+
+    def __init__(self, keys, boxed=False):
+        args = []
+        for key in keys:
+            args += [Value(key), KeyTransform(key, 'custom_fields')]
+        super().__init__(*args)
+        self.boxed = boxed
+
+    def _pairs(self, compiler):
+        expressions = self.get_source_expressions()
+        for name, value in zip(expressions[::2], expressions[1::2]):
+            column, column_params = compiler.compile(value.lhs)
+            yield name.value, value.key_name, column, column_params
+
+    def _chunked(self, parts, function, merge):
+        calls, params = [], []
+        for start in range(0, len(parts), self.keys_per_call):
+            chunk = parts[start:start + self.keys_per_call]
+            calls.append(f"{function}({', '.join(sql for sql, _ in chunk)})")
+            params += [param for _, chunk_params in chunk for param in chunk_params]
+        return merge(calls), params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        parts = []
+        for name, key, column, column_params in self._pairs(compiler):
+            if self.boxed:
+                parts.append((
+                    f"%s, CASE WHEN {column} ? %s THEN JSONB_BUILD_ARRAY({column} -> %s) END",
+                    [name, *column_params, key, *column_params, key],
+                ))
+            else:
+                parts.append((f"%s, {column} -> %s", [name, *column_params, key]))
+        return self._chunked(parts, 'JSONB_BUILD_OBJECT', lambda calls: f"({' || '.join(calls)})")
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # JSON_EXTRACT returns booleans as 0/1, JSON_TYPE tells them apart from numbers
+        parts = []
+        for name, key, column, column_params in self._pairs(compiler):
+            path = compile_json_path([key])
+            extracted = (
+                f"CASE JSON_TYPE({column}, %s) WHEN 'true' THEN JSON('true') WHEN 'false' THEN JSON('false') "
+                f"ELSE JSON_EXTRACT({column}, %s) END"
+            )
+            extracted_params = [*column_params, path, *column_params, path]
+            if self.boxed:
+                # JSON_TYPE is SQL NULL for a missing key and 'null' for a stored null
+                parts.append((
+                    f"%s, CASE WHEN JSON_TYPE({column}, %s) IS NOT NULL THEN JSON_ARRAY({extracted}) END",
+                    [name, *column_params, path, *extracted_params],
+                ))
+            else:
+                parts.append((f"%s, {extracted}", [name, *extracted_params]))
+
+        def merge(calls):
+            # JSON_PATCH drops the null members of the chunks it merges in, which reads
+            # the same as a key the employee has no value for
+            merged = calls[0]
+            for call in calls[1:]:
+                merged = f"JSON_PATCH({merged}, {call})"
+            return merged
+
+        return self._chunked(parts, 'JSON_OBJECT', merge)
+
+
+def _names(query_params, param):
+    names = [name.strip() for name in query_params[param].split(',') if name.strip()]
+    if not names:
+        raise ValidationError({param: 'List at least one name.'})
+    return names
+
+
+def parse_projection(query_params, user_id):
+    """
+    Read ?fields=id,name,email and ?cf=experience,age into (fields, custom_field_keys).
+
+    Returns None without either parameter. `fields` keeps the serializer's field order,
+    ?cf= implies custom_fields and narrows it to the listed keys.
+    """
+    if FIELDS_PARAM not in query_params and CUSTOM_FIELDS_PARAM not in query_params:
+        return None
+
+    fields = EMPLOYEE_FIELDS
+    if FIELDS_PARAM in query_params:
+        requested = _names(query_params, FIELDS_PARAM)
+        unknown = [name for name in requested if name not in EMPLOYEE_FIELDS]
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: f"Unknown fields: {', '.join(unknown)}."})
+        fields = tuple(name for name in EMPLOYEE_FIELDS if name in requested)
+
+    keys = None
+    if CUSTOM_FIELDS_PARAM in query_params:
+        keys = tuple(dict.fromkeys(_names(query_params, CUSTOM_FIELDS_PARAM)))
+        validators = get_custom_field_validators(user_id)
+        unknown = [key for key in keys if key not in validators]
+        if unknown:
+            raise ValidationError({CUSTOM_FIELDS_PARAM: f"Unknown custom fields: {', '.join(unknown)}."})
+        if 'custom_fields' not in fields:
+            fields = tuple(name for name in EMPLOYEE_FIELDS if name in fields or name == 'custom_fields')
+    return fields, keys
+
+
+def project_rows(queryset, projection, ordering=None):
+    """
+    Select only the projected columns (and custom_fields keys) as dicts.
+
+    The plain field `ordering` sorts on is selected too, cursor pagination reads it from
+    the rows. shape_rows() drops it again.
+    """
+    fields, keys = projection
+    columns = [name for name in fields if not (keys and name == 'custom_fields')]
+    for name in ('id', (ordering or '').lstrip('-')):
+        if name in ORDERING_FIELDS and name not in columns:
+            columns.append(name)
+    if keys:
+        return queryset.values(*columns, **{_CUSTOM_FIELDS_ALIAS: CustomFieldValues(keys, boxed=True)})
+    return queryset.values(*columns)
+
+
+def shape_rows(rows, projection):
+    # The projected rows in the serializer's field order, without the extra columns
+    fields, keys = projection
+    shaped = []
+    for row in rows:
+        if keys:
+            values = row.pop(_CUSTOM_FIELDS_ALIAS)
+            # Keys the employee has no value for are left out, stored nulls are kept
+            row['custom_fields'] = {key: boxed[0] for key, boxed in values.items() if boxed is not None}
+        shaped.append({name: row[name] for name in fields})
+    return shaped
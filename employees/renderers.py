@@ -0,0 +1,102 @@
+import re
+import time
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .metrics import current_stats
+
+try:
+    import orjson
+except ImportError:  # Optional, JSONRenderer's output is produced by the json module then
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional, pip install msgpack enables application/msgpack
+    msgpack = None
+
+
+# Floats that json and orjson print differently, like 1e-05 (0.00001) or 1e+16 (1e16).
+# Everything else orjson writes exactly like JSONRenderer's compact output. Values follow
+# ':', ',' or '[' in compact output, so hex ids or names like "Employee 3e" don't match
+_FLOAT_FORMAT_DIFFERS = re.compile(rb'[:,\[]-?\d+(?:\.\d*)?[eE]|[:,\[]-?0\.0000')
+# Cheap prefilter before the slower regex: each of those floats holds '0.0000', or a
+# digit followed by 'e' ('0e' once digits are mapped to 0, bytes.translate is a single pass)
+_DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+
+
+def _may_hold_differing_floats(content):
+    return b'0.0000' in content or b'0e' in content.translate(_DIGITS_TO_ZERO)
+
+
+class TimedRenderMixin:
+    # Rendering is counted as serializer time of the request, the list fast path has no serializer
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        stats = current_stats.get()
+        if stats is None:
+            return self.encode(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return self.encode(data, accepted_media_type, renderer_context)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+
+
+class FastJSONRenderer(TimedRenderMixin, JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson, byte for byte the same output.
+
+    Falls back to the json module when orjson is missing, for indented output, for
+    values orjson can't encode the same way (Decimal, non-string keys, huge ints) and
+    when the output holds floats the two libraries format differently.
+    """
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        # JSONRenderer.render directly, super().render is the timing wrapper that called us
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return JSONRenderer.render(self, data, accepted_media_type, renderer_context)
+
+        content = fast_dumps(data, self.encoder_class().default)
+        if content is None:
+            return JSONRenderer.render(self, data, accepted_media_type, renderer_context)
+        return content
+
+
+class MessagePackRenderer(TimedRenderMixin, BaseRenderer):
+    """
+    application/msgpack, the same data as the JSON responses in a smaller binary form.
+
+    Values MessagePack has no type for (Decimal, dates, UUIDs) are converted the way
+    the JSON encoder converts them. Needs the msgpack package.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default)
+
+
+def fast_dumps(data, default):
+    # Compact orjson output, or None when it could differ from json.dumps
+    try:
+        content = orjson.dumps(data, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    except (TypeError, orjson.JSONEncodeError):
+        return None
+    if _may_hold_differing_floats(content) and _FLOAT_FORMAT_DIFFERS.search(content):
+        return None
+    # Same escaping of the line separators as JSONRenderer
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+_renderer = FastJSONRenderer()
+
+
+def dumps(data):
+    # Compact JSON text exactly as the API renders `data`
+    return _renderer.render(data).decode()
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from .field_types import compile_validators
+from .models import CustomField
+
+
+SCHEMA_CACHE_TIMEOUT = getattr(settings, 'CUSTOM_FIELD_SCHEMA_CACHE_TIMEOUT', 60 * 60)
+# Users whose schema a process keeps, the least recently used one goes first
+SCHEMA_LOCAL_SIZE = getattr(settings, 'CUSTOM_FIELD_SCHEMA_LOCAL_SIZE', 1000)
+
+# user_id -> (version, schema, validators), checked against the shared version on every lookup
+_local_schemas = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f'employees:custom-field-schema:version:{user_id}'
+
+
+def _schema_key(user_id, version):
+    return f'employees:custom-field-schema:{user_id}:{version}'
+
+
+def _load_schema(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Unknown or evicted, start a new version other processes will agree on
+        cache.add(_version_key(user_id), time.time_ns(), SCHEMA_CACHE_TIMEOUT)
+        version = cache.get(_version_key(user_id))
+
+    with _local_lock:
+        local = _local_schemas.get(user_id)
+        if local is not None and local[0] == version:
+            _local_schemas.move_to_end(user_id)
+            return local
+
+    schema = cache.get(_schema_key(user_id, version))
+    if schema is None:
+        schema = dict(
+            CustomField.objects.filter(user_id=user_id).order_by('id').values_list('field_name', 'field_type')
+        )
+        cache.set(_schema_key(user_id, version), schema, SCHEMA_CACHE_TIMEOUT)
+
+    # Validators are compiled once per schema version and reused by every request
+    local = (version, schema, compile_validators(schema))
+    with _local_lock:
+        _local_schemas[user_id] = local
+        _local_schemas.move_to_end(user_id)
+        while len(_local_schemas) > SCHEMA_LOCAL_SIZE:
+            _local_schemas.popitem(last=False)
+    return local
+
+
+def get_custom_field_schema(user_id):
+    """
+    Return the user's custom fields as an ordered {field_name: field_type} dict.
+
+    Lookups go process memory -> shared cache (Redis) -> database. The process copy is
+    reused while its version matches the shared one, so the hot path costs one cache
+    read and no queries.
+    """
+    return _load_schema(user_id)[1]
+
+
+def get_custom_field_validators(user_id):
+    # {field_name: coercer} compiled from the cached schema, see field_types.py
+    return _load_schema(user_id)[2]
+
+
+def invalidate_custom_field_schema(user_id):
+    # A new version makes every process and the old shared entry stale at once
+    cache.set(_version_key(user_id), time.time_ns(), SCHEMA_CACHE_TIMEOUT)
+    with _local_lock:
+        _local_schemas.pop(user_id, None)
@@ -0,0 +1,38 @@
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+def search_employees(queryset, term):
+    # name/email match anywhere, phone numbers only match on a prefix
+    term = term.strip()
+    if not term:
+        # An empty term would match every row
+        return queryset
+
+    queryset = queryset.filter(
+        Q(name__icontains=term) |
+        Q(email__icontains=term) |
+        Q(phone_number__startswith=term)
+    )
+
+    # On Postgres the filters above are served by the trigram/pattern indexes
+    # from migration 0005, so ranking only touches the matched rows
+    if connections[queryset.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return queryset.annotate(
+            rank=Greatest(TrigramSimilarity('name', term), TrigramSimilarity('email', term))
+        ).order_by('-rank', 'id')
+
+    # Elsewhere there is no similarity, exact and prefix matches come before matches
+    # inside the name or email
+    return queryset.annotate(
+        rank=Case(
+            When(Q(name__iexact=term) | Q(email__iexact=term), then=Value(0)),
+            When(Q(name__istartswith=term) | Q(email__istartswith=term), then=Value(1)),
+            When(Q(name__icontains=term) | Q(email__icontains=term), then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+    ).order_by('rank', 'id')
@@ -1,34 +1,69 @@
 from rest_framework import serializers
 from .models import Employee,CustomField
+from .field_types import FIELD_TYPES, coerce_custom_fields
+from .schema import get_custom_field_validators
+from .metrics import TimedListSerializer, TimedSerializerMixin
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Employee
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'user', 'name', 'email', 'phone_number', 'custom_fields']
+        read_only_fields = ['user']  # Set from request.user by the view
 
     def validate_custom_fields(self, value):
-        # Get the user's custom fields
-        user_custom_fields = CustomField.objects.filter(user=self.context['request'].user).values_list('field_name', flat=True)
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Custom fields must be an object.")
+
+        # Get the user's compiled custom fields, batch callers pass them in once via the context
+        validators = self.context.get('custom_field_validators')
+        if validators is None:
+            validators = get_custom_field_validators(self.context['request'].user.id)
 
         # Check for invalid fields
-        invalid_fields = [key for key in value.keys() if key not in user_custom_fields]
+        invalid_fields = [key for key in value.keys() if key not in validators]
         if invalid_fields:
             raise serializers.ValidationError(f"Invalid custom fields: {', '.join(invalid_fields)}")
 
-        return value
+        # Coerce values to the native JSON type of their field_type
+        cleaned, errors = coerce_custom_fields(validators, value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return cleaned
+
+
+def employee_rows(queryset):
+    # Read-only fast path: the dicts EmployeeSerializer would produce, straight from .values()
+    # ('user' gives the user id, like the PrimaryKeyRelatedField), without field objects per row
+    return queryset.values(*EmployeeSerializer.Meta.fields)
 
 
-class CustomFieldSerializer(serializers.ModelSerializer):
+class BulkEmployeeSerializer(EmployeeSerializer):
+    class Meta(EmployeeSerializer.Meta):
+        # Email uniqueness is checked once for the whole batch, not per row
+        extra_kwargs = {'email': {'validators': []}}
+
+
+class CustomFieldSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomField
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'user', 'field_name', 'field_type']
         read_only_fields = ['user']  # Prevent user from being set manually
     
 
+    def validate_field_type(self, value):
+        if value not in FIELD_TYPES:
+            raise serializers.ValidationError(f"Field type must be one of: {', '.join(FIELD_TYPES)}.")
+        return value
+
     def validate_field_name(self, value):
         user = self.context['request'].user
-        if CustomField.objects.filter(user=user, field_name=value).exists():
+        existing = CustomField.objects.filter(user=user, field_name=value)
+        if self.instance is not None:
+            existing = existing.exclude(pk=self.instance.pk)
+        if existing.exists():
             raise serializers.ValidationError("A custom field with this name already exists for this user.")
         return value
     
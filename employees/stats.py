@@ -0,0 +1,99 @@
+from django.db.models import Avg, Count, FloatField, Func, Max, Min
+from django.db.models.fields.json import KeyTransform, compile_json_path
+from rest_framework.exceptions import ValidationError
+from .projection import CustomFieldValues
+
+
+GROUP_BY_PARAM = 'group_by'
+NUMERIC_PARAM = 'numeric'
+
+# Values returned per group_by key, the most common first
+FACET_LIMIT = 100
+
+
+class CustomFieldNumber(Func):
+    # The key's value when it is a JSON number, else NULL, so aggregates skip other types
+    output_field = FloatField()
+
+    def __init__(self, key):
+        super().__init__(KeyTransform(key, 'custom_fields'))
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        value, params = compiler.compile(self.get_source_expressions()[0])
+        return (
+            f"CASE WHEN JSONB_TYPEOF({value}) = 'number' THEN ({value})::text::double precision END",
+            params * 2,
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        key_transform = self.get_source_expressions()[0]
+        column, params = compiler.compile(key_transform.lhs)
+        path = compile_json_path([key_transform.key_name])
+        return (
+            f"CASE WHEN JSON_TYPE({column}, %s) IN ('integer', 'real') THEN JSON_EXTRACT({column}, %s) END",
+            [*params, path, *params, path],
+        )
+
+
+def _number(value):
+    # Whole numbers as ints, like coerce_number stores them
+    if value is None:
+        return None
+    return int(value) if float(value).is_integer() else value
+
+
+def _keys(query_params, param, schema, field_type=None):
+    keys = list(dict.fromkeys(name.strip() for name in query_params.get(param, '').split(',') if name.strip()))
+    for key in keys:
+        if key not in schema:
+            raise ValidationError({param: f"Unknown custom field '{key}'."})
+        if field_type and schema[key] != field_type:
+            raise ValidationError({param: f"'{key}' is not a {field_type} field."})
+    return keys
+
+
+def employee_stats(queryset, query_params, schema):
+    """
+    Count the employees of `queryset` and aggregate their custom field values in the database.
+
+    ?numeric=experience,age adds min/max/avg (and how many have a value) of number fields.
+    ?group_by=team,level adds the FACET_LIMIT most common values of each field with their
+    counts, employees without a value are counted under null. Costs one aggregate query
+    plus one GROUP BY query per group_by field.
+    """
+    group_by = _keys(query_params, GROUP_BY_PARAM, schema)
+    numeric = _keys(query_params, NUMERIC_PARAM, schema, field_type='number')
+
+    aggregates = {'count': Count('id')}
+    for index, key in enumerate(numeric):
+        value = CustomFieldNumber(key)
+        aggregates.update({
+            f'n{index}_count': Count(value), f'n{index}_min': Min(value),
+            f'n{index}_max': Max(value), f'n{index}_avg': Avg(value),
+        })
+    totals = queryset.order_by().aggregate(**aggregates)
+
+    stats = {'count': totals['count']}
+    if numeric:
+        stats['numeric'] = {
+            key: {
+                'count': totals[f'n{index}_count'],
+                'min': _number(totals[f'n{index}_min']),
+                'max': _number(totals[f'n{index}_max']),
+                'avg': _number(totals[f'n{index}_avg']),
+            }
+            for index, key in enumerate(numeric)
+        }
+
+    if group_by:
+        stats['facets'] = {}
+        for key in group_by:
+            # Grouped on {key: value} built like the ?cf= projection, which keeps JSON types apart
+            rows = (
+                queryset.order_by()
+                .values(value=CustomFieldValues([key]))
+                .annotate(count=Count('id'))
+                .order_by('-count', 'value')[:FACET_LIMIT]
+            )
+            stats['facets'][key] = [{'value': row['value'].get(key), 'count': row['count']} for row in rows]
+    return stats
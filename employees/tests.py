@@ -1,11 +1,54 @@
+import importlib.util
+import io
+import json
+import logging
+import os
+import random
+import runpy
+import sys
+import tempfile
 import time
+import zlib
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncRequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from user_account.models import CustomUser
+from user_account.utils import get_tokens
+from .models import Employee, CustomField, EmployeeChange, EmployeeEmailGuard
+from .changes import changes_since, decode_token, head_token, record_changes
+from .filters import filter_custom_fields
+from .cache import cache_metrics
+from .db_metrics import database_metrics
+from .benchmark import build_request, cleanup, seed
+from .compression import CODECS, negotiate_encoding
+from .log import JSONFormatter, QueueLogHandler, SamplingFilter
+from .renderers import FastJSONRenderer
+from .serializer import EmployeeSerializer
+from . import async_views, middleware, partitioning, schema
+
+# Recording changes locks the user row first where the database has row locks
+FEED_LOCK_QUERIES = 1 if connection.features.has_select_for_update else 0
 
 class TestUserAndEmployeeAPIs(APITestCase):
 
     def setUp(self):
+        cache.clear()
         # Generate a unique email for each test run
         self.user_data = {
             'email': f'testuser_{int(time.time())}@example.com',  # Unique email
@@ -101,4 +144,1354 @@ class TestUserAndEmployeeAPIs(APITestCase):
         # Search for a non-existent name
         search_response = self.client.get('/employee/api/employees/?search=NonExistent')
         self.assertEqual(search_response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(search_response.data), 0)  # Should return no result
\ No newline at end of file
+        self.assertEqual(len(search_response.data), 0)  # Should return no result
+
+    def test_search_ranking(self):
+        # Created worst match first, so the id order is the reverse of the ranking
+        for number, name in enumerate(['Joanne Smith', 'Annabel Lee', 'Ann']):
+            self.client.post('/employee/api/employees/', {
+                'name': name, 'email': f'staff{number}@example.com', 'phone_number': str(number),
+            }, format='json')
+
+        search_response = self.client.get('/employee/api/employees/?search=ann')
+        self.assertEqual([row['name'] for row in search_response.data], ['Ann', 'Annabel Lee', 'Joanne Smith'])
+
+        # A blank term is no search at all
+        with CaptureQueriesContext(connection) as queries:
+            search_response = self.client.get('/employee/api/employees/?search=%20%20')
+        self.assertCountEqual([row['name'] for row in search_response.data], ['Joanne Smith', 'Annabel Lee', 'Ann'])
+        self.assertFalse([query for query in queries if 'LIKE' in query['sql']])
+
+    def test_cursor_pagination(self):
+        # Create a handful of employees to page through
+        for i in range(5):
+            self.client.post('/employee/api/employees/', {
+                'name': f'Employee {i}',
+                'email': f'employee{i}@example.com',
+                'phone_number': f'55500000{i}',
+            }, format='json')
+
+        # Without page_size/cursor the response stays a plain list
+        response = self.client.get('/employee/api/employees/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+        # Walk all pages using the opaque next cursor
+        names = []
+        url = '/employee/api/employees/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            names.extend(employee['name'] for employee in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(names, [f'Employee {i}' for i in range(5)])
+
+        # A chosen sort key is honoured, unknown keys are rejected
+        response = self.client.get('/employee/api/employees/?page_size=2&ordering=-name')
+        self.assertEqual([e['name'] for e in response.data['results']], ['Employee 4', 'Employee 3'])
+        response = self.client.get('/employee/api/employees/?page_size=2&ordering=custom_fields')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pagination_through_ties(self):
+        # Rows sharing a name are told apart by id in the cursor, not skipped with an offset
+        for i, name in enumerate(['Bo', 'Al', 'Bo', 'Cy', 'Bo', 'Bo', 'Al']):
+            self.client.post('/employee/api/employees/', {
+                'name': name, 'email': f'tie{i}@example.com', 'phone_number': str(i),
+            }, format='json')
+        employees = list(Employee.objects.values_list('name', 'id'))
+
+        for ordering, expected in [('name', sorted(employees)), ('-name', sorted(employees, reverse=True))]:
+            pages, url = [], f'/employee/api/employees/?page_size=2&ordering={ordering}'
+            with CaptureQueriesContext(connection) as queries:
+                while url:
+                    response = self.client.get(url)
+                    pages.append([employee['id'] for employee in response.data['results']])
+                    url = response.data['next']
+            self.assertEqual(sum(pages, []), [employee_id for _, employee_id in expected])
+            self.assertFalse([query for query in queries if 'OFFSET' in query['sql']])
+
+            # And back again from the last page
+            backwards, url = [], response.data['previous']
+            while url:
+                response = self.client.get(url)
+                backwards.insert(0, [employee['id'] for employee in response.data['results']])
+                url = response.data['previous']
+            self.assertEqual(backwards, pages[:-1])
+
+        response = self.client.get('/employee/api/employees/?page_size=2&ordering=name&cursor=cD1bIkFsIl0%3D')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+    def test_search_phone_prefix(self):
+        employees = [
+            {'name': 'Dana White', 'email': 'dana@example.com', 'phone_number': '4445556666'},
+            {'name': 'Eve Black', 'email': 'eve@example.com', 'phone_number': '5554446666'},
+        ]
+        for employee in employees:
+            self.client.post('/employee/api/employees/', employee, format='json')
+
+        # Phone numbers match on their prefix only
+        search_response = self.client.get('/employee/api/employees/?search=444')
+        self.assertEqual(search_response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e['name'] for e in search_response.data], ['Dana White'])
+
+        # Email is still matched anywhere in the value
+        search_response = self.client.get('/employee/api/employees/?search=VE@EXAMPLE')
+        self.assertEqual([e['name'] for e in search_response.data], ['Eve Black'])
+
+
+
+class UserAPITestCase(APITestCase):
+    # Authenticated client for a fresh user, shared caches start empty
+    email = 'user@example.com'
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email=self.email, name='Test User', password='testpass')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + get_tokens(self.user)['access'])
+
+
+class TestQueryPlans(UserAPITestCase):
+    # Guards the number of queries per endpoint and that the user scoped
+    # lookups stay on the composite indexes
+
+    email = 'plans@example.com'
+
+    def setUp(self):
+        super().setUp()
+        self.custom_field = CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        self.employee = Employee.objects.create(
+            user=self.user, name='Jane Roe', email='jane@example.com', phone_number='1234567890',
+            custom_fields={'experience': 3},
+        )
+
+    def test_employee_endpoint_query_counts(self):
+        # One query for the authenticated user, the rest is the endpoint itself
+        with self.assertNumQueries(2):
+            self.client.get('/employee/api/employees/')
+        with self.assertNumQueries(2):
+            self.client.get('/employee/api/employees/?page_size=10')
+        with self.assertNumQueries(2):
+            self.client.get(f'/employee/api/employees/{self.employee.id}/')
+        # Writes also add a change log entry, in tests their transaction shows up as a savepoint
+        with self.assertNumQueries(7 + FEED_LOCK_QUERIES):
+            response = self.client.post('/employee/api/employees/', {
+                'name': 'Max Roe', 'email': 'max@example.com', 'phone_number': '555',
+                'custom_fields': {'experience': 1},
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(6 + FEED_LOCK_QUERIES):
+            self.client.patch(f'/employee/api/employees/{self.employee.id}/', {'name': 'Jane Doe'}, format='json')
+        with self.assertNumQueries(6 + FEED_LOCK_QUERIES):
+            self.client.delete(f'/employee/api/employees/{self.employee.id}/')
+
+    def test_custom_field_endpoint_query_counts(self):
+        with self.assertNumQueries(2):
+            self.client.get('/employee/api/custom-fields/')
+        with self.assertNumQueries(3):
+            response = self.client.post('/employee/api/custom-fields/', {'field_name': 'age', 'field_type': 'number'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_custom_field_schema_is_cached(self):
+        def create(email, custom_fields):
+            return self.client.post('/employee/api/employees/', {
+                'name': 'Cached', 'email': email, 'phone_number': '1', 'custom_fields': custom_fields,
+            }, format='json')
+
+        self.assertEqual(create('c1@example.com', {'experience': 1}).status_code, status.HTTP_201_CREATED)
+        # Warm schema: auth + email check + insert + change log, no custom field query
+        with self.assertNumQueries(6 + FEED_LOCK_QUERIES):
+            self.assertEqual(create('c2@example.com', {'experience': 2}).status_code, status.HTTP_201_CREATED)
+
+        # Creating and deleting fields through the API invalidates the schema
+        response = self.client.post('/employee/api/custom-fields/', {'field_name': 'age', 'field_type': 'number'}, format='json')
+        self.assertEqual(create('c3@example.com', {'age': 30}).status_code, status.HTTP_201_CREATED)
+        self.client.delete(f"/employee/api/custom-fields/{response.data['id']}/")
+        self.assertEqual(create('c4@example.com', {'age': 30}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_local_schema_cache_is_bounded(self):
+        users = [self.user] + [
+            CustomUser.objects.create_user(email=f'lru{i}@example.com', name='LRU', password='testpass') for i in range(2)
+        ]
+        with mock.patch.object(schema, 'SCHEMA_LOCAL_SIZE', 2), mock.patch.object(schema, '_local_schemas', OrderedDict()):
+            for user in users:
+                schema.get_custom_field_schema(user.id)
+            self.assertEqual(list(schema._local_schemas), [users[1].id, users[2].id])
+            # A lookup makes a user the most recently used one
+            schema.get_custom_field_schema(users[1].id)
+            schema.get_custom_field_schema(self.user.id)
+            self.assertEqual(list(schema._local_schemas), [users[1].id, self.user.id])
+
+    def test_custom_field_values_are_typed(self):
+        CustomField.objects.create(user=self.user, field_name='remote', field_type='boolean')
+        CustomField.objects.create(user=self.user, field_name='joined', field_type='date')
+
+        # Values are stored as native JSON types of their field_type
+        response = self.client.patch(f'/employee/api/employees/{self.employee.id}/', {
+            'custom_fields': {'experience': '21', 'remote': 'yes', 'joined': '2024-10-26'},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.custom_fields, {'experience': 21, 'remote': True, 'joined': '2024-10-26'})
+
+        response = self.client.patch(f'/employee/api/employees/{self.employee.id}/', {
+            'custom_fields': {'experience': 'lots', 'joined': '26/10/2024'},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['custom_fields']), {'experience', 'joined'})
+
+        # Only known field types can be defined
+        response = self.client.post('/employee/api/custom-fields/', {'field_name': 'x', 'field_type': 'colour'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_custom_field_type_change_converts_values(self):
+        other = Employee.objects.create(user=self.user, name='Other', email='other@example.com', phone_number='1',
+                                        custom_fields={'experience': None})
+        url = f'/employee/api/custom-fields/{self.custom_field.id}/'
+        self.employee.custom_fields = {'experience': 1}
+        self.employee.save()
+        head = head_token(self.user)
+
+        response = self.client.patch(url, {'field_type': 'boolean'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.employee.refresh_from_db()
+        other.refresh_from_db()
+        self.assertIs(self.employee.custom_fields['experience'], True)
+        self.assertEqual(other.custom_fields, {'experience': None})
+        self.assertEqual([change['id'] for change in changes_since(self.user, decode_token(head))['changes']],
+                         [self.employee.id])
+
+        # Values the new type can't hold refuse the change, nothing is converted
+        Employee.objects.filter(id=other.id).update(custom_fields={'experience': 'not sure'})
+        response = self.client.patch(url, {'field_type': 'number'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f'(ids {self.employee.id}, {other.id})', response.data['field_type'])
+        self.custom_field.refresh_from_db()
+        self.assertEqual(self.custom_field.field_type, 'boolean')
+        self.employee.refresh_from_db()
+        self.assertIs(self.employee.custom_fields['experience'], True)
+        response = self.client.patch(f'/employee/api/employees/{self.employee.id}/', {
+            'custom_fields': {'experience': 'yes'},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(url, {'field_type': 'text'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Employee.objects.get(id=self.employee.id).custom_fields, {'experience': 'true'})
+
+    def test_custom_field_delete_is_set_based(self):
+        other_user = CustomUser.objects.create_user(email='other@example.com', name='Other', password='testpass')
+        other = Employee.objects.create(user=other_user, name='Other', email='other@example.com', phone_number='1',
+                                        custom_fields={'experience': 9})
+        for i in range(5):
+            Employee.objects.create(user=self.user, name=f'E{i}', email=f'e{i}@example.com', phone_number='1',
+                                    custom_fields={'experience': i, 'team': 'ops'})
+
+        response = self.client.delete(f'/employee/api/custom-fields/{self.custom_field.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Employee.objects.filter(user=self.user).order_by('id').values_list('custom_fields', flat=True)),
+            [{}] + [{'team': 'ops'}] * 5,
+        )
+        other.refresh_from_db()
+        self.assertEqual(other.custom_fields, {'experience': 9})
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are only checked on PostgreSQL')
+    def test_user_scoped_lookups_use_indexes(self):
+        querysets = [
+            Employee.objects.filter(user=self.user).order_by('id'),
+            Employee.objects.filter(user=self.user).order_by('name', 'id'),
+            Employee.objects.filter(user=self.user, id=self.employee.id),
+            CustomField.objects.filter(user=self.user),
+            CustomField.objects.filter(user=self.user, field_name='experience'),
+        ]
+        with connection.cursor() as cursor:
+            # The tables are tiny here, make the planner show which index it would use
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                for queryset in querysets:
+                    plan = queryset.explain()
+                    self.assertNotIn('Seq Scan', plan, msg=f'{queryset.query}\n{plan}')
+            finally:
+                cursor.execute('RESET enable_seqscan')
+
+
+class TestBulkEmployeeAPI(UserAPITestCase):
+
+    email = 'bulk@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        self.existing = Employee.objects.create(user=self.user, name='Old Name', email='old@example.com', phone_number='1')
+        self.doomed = Employee.objects.create(user=self.user, name='Doomed', email='doomed@example.com', phone_number='2')
+
+    def test_bulk_operations(self):
+        operations = [
+            {'op': 'create', 'data': {'name': 'New One', 'email': 'new1@example.com', 'phone_number': '3', 'custom_fields': {'experience': 2}}},
+            {'op': 'create', 'data': {'name': 'New Two', 'email': 'new2@example.com', 'phone_number': '4'}},
+            {'op': 'update', 'id': self.existing.id, 'data': {'name': 'New Name'}},
+            {'op': 'delete', 'id': self.doomed.id},
+            # Invalid items are reported and skipped
+            {'op': 'create', 'data': {'name': 'Dup', 'email': 'new1@example.com', 'phone_number': '5'}},
+            {'op': 'create', 'data': {'name': 'Bad', 'email': 'bad@example.com', 'phone_number': '6', 'custom_fields': {'age': 1}}},
+            {'op': 'update', 'id': 999999, 'data': {'name': 'Missing'}},
+            {'op': 'upsert'},
+        ]
+        # auth + custom fields + targets + emails + savepoint/delete/update/insert/change log, independent of batch size
+        with self.assertNumQueries(11 + 2 * FEED_LOCK_QUERIES):
+            response = self.client.post('/employee/api/employees/bulk/', operations, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in response.data['results']], [201, 201, 200, 204, 400, 400, 404, 400])
+
+        self.assertEqual(response.data['results'][0]['data']['custom_fields'], {'experience': 2})
+        self.assertEqual(Employee.objects.get(id=self.existing.id).name, 'New Name')
+        self.assertFalse(Employee.objects.filter(id=self.doomed.id).exists())
+        self.assertEqual(Employee.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_rejects_repeated_ids(self):
+        response = self.client.post('/employee/api/employees/bulk/', [
+            {'op': 'delete', 'id': self.doomed.id},
+            {'op': 'update', 'id': self.doomed.id, 'data': {'name': 'Ghost'}},
+            {'op': 'update', 'id': self.existing.id, 'data': {'name': 'First'}},
+            {'op': 'update', 'id': self.existing.id, 'data': {'name': 'Second'}},
+        ], format='json')
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [204, 400, 200, 400])
+        self.assertIn('id', results[1]['errors'])
+        self.assertFalse(Employee.objects.filter(id=self.doomed.id).exists())
+        self.assertEqual(Employee.objects.get(id=self.existing.id).name, 'First')
+
+    def test_bulk_requires_operations(self):
+        response = self.client.post('/employee/api/employees/bulk/', {'operations': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestEmployeeImport(UserAPITestCase):
+
+    email = 'import@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        Employee.objects.create(user=self.user, name='Taken', email='taken@example.com', phone_number='1')
+
+    def test_import_csv_upload(self):
+        content = (
+            'name,email,phone_number,experience\n'
+            'Ann,ann@example.com,100,5\n'
+            'Ben,ben@example.com,200,\n'
+            'Ann Again,ann@example.com,300,1\n'   # duplicate inside the file
+            'Taken,taken@example.com,400,1\n'     # already stored
+            'Bad,not-an-email,500,1\n'
+        ).encode()
+        upload = SimpleUploadedFile('employees.csv', content, content_type='text/csv')
+        response = self.client.post('/employee/api/employees/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['rejected']), (2, 3))
+        self.assertEqual([r['line'] for r in response.data['rejections']], [4, 5, 6])
+        self.assertEqual(Employee.objects.get(email='ann@example.com').custom_fields, {'experience': 5})
+
+    def test_import_ndjson_command(self):
+        lines = [
+            '{"name": "Cat", "email": "cat@example.com", "phone_number": "1", "custom_fields": {"experience": 2}}',
+            '{"name": "Dan", "email": "dan@example.com", "phone_number": "2", "custom_fields": {"unknown": 1}}',
+            'not json',
+            '{"name": "Eve", "email": "eve@example.com", "phone_number": "3"}',
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'employees.ndjson')
+            rejects = os.path.join(directory, 'rejects.csv')
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines))
+            call_command('import_employees', path, user=self.user.email, batch_size=2, rejects=rejects, stdout=io.StringIO())
+            with open(rejects) as f:
+                self.assertEqual(len(f.readlines()), 3)  # header + two rejected rows
+
+        self.assertEqual(
+            sorted(Employee.objects.filter(user=self.user).values_list('name', flat=True)),
+            ['Cat', 'Eve', 'Taken'],
+        )
+
+    def test_import_command_invalidates_cached_list(self):
+        before = self.client.get('/employee/api/employees/')
+        self.assertEqual(len(before.data), 1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'employees.ndjson')
+            with open(path, 'w') as f:
+                f.write('{"name": "Fay", "email": "fay@example.com", "phone_number": "1"}')
+            call_command('import_employees', path, user=self.user.email, stdout=io.StringIO())
+
+        after = self.client.get('/employee/api/employees/', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(len(after.data), 2)
+
+
+class TestEmployeeExport(UserAPITestCase):
+
+    email = 'export@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        CustomField.objects.create(user=self.user, field_name='team', field_type='text')
+        Employee.objects.create(user=self.user, name='Ann', email='ann@example.com', phone_number='1',
+                                custom_fields={'experience': 5})
+        Employee.objects.create(user=self.user, name='Ben, Jr.', email='ben@example.com', phone_number='2',
+                                custom_fields={'team': 'ops'})
+
+    def export(self, output):
+        response = self.client.get(f'/employee/api/employees/export/?output={output}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        self.assertEqual(self.export('csv').splitlines(), [
+            'id,name,email,phone_number,experience,team',
+            f'{Employee.objects.get(name="Ann").id},Ann,ann@example.com,1,5,',
+            f'{Employee.objects.get(name="Ben, Jr.").id},"Ben, Jr.",ben@example.com,2,,ops',
+        ])
+
+    def test_export_ndjson_and_json(self):
+        listed = self.client.get('/employee/api/employees/').json()
+        self.assertEqual([json.loads(line) for line in self.export('ndjson').splitlines()], listed)
+        self.assertEqual(json.loads(self.export('json')), listed)
+
+        response = self.client.get('/employee/api/employees/export/?output=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestCustomFieldFilters(UserAPITestCase):
+    email = 'filters@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        CustomField.objects.create(user=self.user, field_name='team', field_type='text')
+        for name, experience, team in [('Ann', 2, 'ops'), ('Ben', 10, 'dev'), ('Cid', 5, 'dev'), ('Dee', None, 'ops')]:
+            custom_fields = {'team': team}
+            if experience is not None:
+                custom_fields['experience'] = experience
+            Employee.objects.create(user=self.user, name=name, email=f'{name.lower()}@example.com',
+                                    phone_number='1', custom_fields=custom_fields)
+
+    def names(self, query):
+        response = self.client.get(f'/employee/api/employees/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [employee['name'] for employee in response.data]
+
+    def test_filter_on_custom_fields(self):
+        self.assertEqual(self.names('cf.experience__gte=5&ordering=name'), ['Ben', 'Cid'])
+        self.assertEqual(self.names('cf.experience__lt=5'), ['Ann'])
+        self.assertEqual(self.names('cf.team=dev&ordering=name'), ['Ben', 'Cid'])
+        self.assertEqual(self.names('cf.experience__in=2,10&ordering=name'), ['Ann', 'Ben'])
+        self.assertEqual(self.names('cf.experience__isnull=true'), ['Dee'])
+        self.assertEqual(self.names('cf.team__icontains=OP&cf.experience__gt=1'), ['Ann'])
+
+    def test_order_on_custom_fields(self):
+        self.assertEqual(self.names('ordering=-cf.experience'), ['Ben', 'Cid', 'Ann', 'Dee'])
+        self.assertEqual(self.names('ordering=cf.experience'), ['Ann', 'Cid', 'Ben', 'Dee'])
+
+    def test_invalid_custom_field_queries(self):
+        for query in ['cf.unknown=1', 'cf.experience__regex=1', 'cf.experience__gte=abc',
+                      'ordering=-cf.unknown', 'page_size=2&ordering=cf.experience']:
+            response = self.client.get(f'/employee/api/employees/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+
+class TestFieldProjection(UserAPITestCase):
+    email = 'projection@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        CustomField.objects.create(user=self.user, field_name='remote', field_type='text')
+        CustomField.objects.create(user=self.user, field_name='manager', field_type='boolean')
+        self.ann = Employee.objects.create(user=self.user, name='Ann', email='ann@example.com', phone_number='1',
+                                           custom_fields={'experience': 2.5, 'remote': 'true', 'manager': False})
+        self.ben = Employee.objects.create(user=self.user, name='Ben', email='ben@example.com', phone_number='2',
+                                           custom_fields={'remote': '5'})
+
+    def get(self, query, status_code=status.HTTP_200_OK):
+        response = self.client.get(f'/employee/api/employees/?{query}')
+        self.assertEqual(response.status_code, status_code, response.content)
+        return json.loads(response.content)
+
+    def test_fields(self):
+        self.assertEqual(self.get('fields=email,name'), [
+            {'name': 'Ann', 'email': 'ann@example.com'}, {'name': 'Ben', 'email': 'ben@example.com'},
+        ])
+        detail = self.client.get(f'/employee/api/employees/{self.ann.id}/?fields=id,phone_number')
+        self.assertEqual(json.loads(detail.content), {'id': self.ann.id, 'phone_number': '1'})
+
+    def test_custom_field_keys(self):
+        # Values keep their JSON types, keys an employee has no value for are left out
+        self.assertEqual(self.get('fields=name&cf=remote,manager,experience'), [
+            {'name': 'Ann', 'custom_fields': {'experience': 2.5, 'remote': 'true', 'manager': False}},
+            {'name': 'Ben', 'custom_fields': {'remote': '5'}},
+        ])
+        self.assertEqual(self.get('cf=manager&search=Ben'), [{
+            'id': self.ben.id, 'user': self.user.id, 'name': 'Ben', 'email': 'ben@example.com',
+            'phone_number': '2', 'custom_fields': {},
+        }])
+
+    def test_stored_nulls_are_kept(self):
+        Employee.objects.filter(id=self.ben.id).update(custom_fields={'remote': '5', 'manager': None})
+        full = {row['name']: row['custom_fields'] for row in self.get('')}
+        self.assertEqual(full['Ben'], {'remote': '5', 'manager': None})
+        projected = {row['name']: row['custom_fields'] for row in self.get('fields=name&cf=manager,experience')}
+        self.assertEqual(projected, {'Ann': {'manager': False, 'experience': 2.5}, 'Ben': {'manager': None}})
+
+    def test_many_custom_field_keys(self):
+        # More keys than one JSONB_BUILD_OBJECT / JSON_OBJECT call takes
+        names = [f'extra{number}' for number in range(60)]
+        CustomField.objects.bulk_create(
+            [CustomField(user=self.user, field_name=name, field_type='text') for name in names]
+        )
+        stored = {name: f'value {number}' for number, name in enumerate(names) if number % 3}
+        stored.update({'extra0': None, 'extra59': True})
+        Employee.objects.filter(id=self.ann.id).update(custom_fields=stored)
+        projected = {row['name']: row['custom_fields'] for row in self.get(f"fields=name&cf={','.join(names)}")}
+        self.assertEqual(projected, {'Ann': stored, 'Ben': {}})
+
+        response = self.client.get(f"/employee/api/employees/stats/?group_by={','.join(names)}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        facets = response.json()['facets']
+        self.assertEqual(len(facets), 60)
+        self.assertCountEqual(facets['extra59'], [{'value': True, 'count': 1}, {'value': None, 'count': 1}])
+
+    def test_projection_is_pushed_into_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get('fields=id,name')
+        self.assertNotIn('custom_fields', queries[-1]['sql'])
+
+    def test_cursor_pages(self):
+        page = self.get('fields=email&ordering=-name&page_size=1')
+        self.assertEqual(page['results'], [{'email': 'ben@example.com'}])
+        self.assertEqual(self.client.get(page['next']).json()['results'], [{'email': 'ann@example.com'}])
+
+    def test_invalid_projection(self):
+        for query in ['fields=salary', 'fields=', 'cf=unknown', 'cf=,']:
+            self.get(query, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/employee/api/employees/{self.ann.id}/?fields=salary')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestEmployeeStats(UserAPITestCase):
+    email = 'stats@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        CustomField.objects.create(user=self.user, field_name='team', field_type='text')
+        CustomField.objects.create(user=self.user, field_name='remote', field_type='boolean')
+        for name, custom_fields in [
+            ('Ann', {'experience': 2, 'team': 'dev', 'remote': True}),
+            ('Ben', {'experience': 10, 'team': 'dev', 'remote': False}),
+            ('Cid', {'experience': 4.5, 'team': 'true', 'remote': True}),
+            ('Dee', {'team': 'dev'}),
+        ]:
+            Employee.objects.create(user=self.user, name=name, email=f'{name.lower()}@example.com',
+                                    phone_number='1', custom_fields=custom_fields)
+
+    def stats(self, query=''):
+        response = self.client.get(f'/employee/api/employees/stats/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json()
+
+    def test_stats(self):
+        self.assertEqual(self.stats(), {'count': 4})
+        stats = self.stats('numeric=experience&group_by=team,remote')
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(stats['numeric'], {'experience': {'count': 3, 'min': 2, 'max': 10, 'avg': 5.5}})
+        # Most common first, JSON types are kept apart ('true' the text is not true the boolean)
+        self.assertEqual(stats['facets']['team'], [{'value': 'dev', 'count': 3}, {'value': 'true', 'count': 1}])
+        self.assertEqual(stats['facets']['remote'][0], {'value': True, 'count': 2})
+        self.assertCountEqual(stats['facets']['remote'][1:], [{'value': False, 'count': 1}, {'value': None, 'count': 1}])
+
+    def test_stats_follow_filters(self):
+        self.assertEqual(self.stats('search=Ben&numeric=experience'),
+                         {'count': 1, 'numeric': {'experience': {'count': 1, 'min': 10, 'max': 10, 'avg': 10}}})
+        self.assertEqual(self.stats('cf.team=dev')['count'], 3)
+
+    def test_stats_are_cached(self):
+        self.stats('group_by=team&numeric=experience')
+        with self.assertNumQueries(1):  # The authenticated user
+            self.stats('group_by=team&numeric=experience')
+        self.client.delete(f"/employee/api/employees/{Employee.objects.get(name='Dee').id}/")
+        self.assertEqual(self.stats('group_by=team&numeric=experience')['count'], 3)
+
+    def test_stats_follow_custom_field_changes(self):
+        self.assertIn('numeric', self.stats('numeric=experience'))
+        experience = CustomField.objects.get(user=self.user, field_name='experience')
+        self.client.patch(f'/employee/api/custom-fields/{experience.id}/', {'field_type': 'text'}, format='json')
+        response = self.client.get('/employee/api/employees/stats/?numeric=experience')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.stats('group_by=team')
+        self.client.post('/employee/api/custom-fields/', {'field_name': 'level', 'field_type': 'number'}, format='json')
+        self.assertEqual(self.stats('group_by=team,level')['facets']['level'], [{'value': None, 'count': 4}])
+
+    def test_invalid_stats_queries(self):
+        for query in ['group_by=unknown', 'numeric=team', 'numeric=unknown']:
+            response = self.client.get(f'/employee/api/employees/stats/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Expression indexes are only created on PostgreSQL')
+class TestCustomFieldIndexCommand(TransactionTestCase):
+    # CREATE INDEX CONCURRENTLY cannot run inside the TestCase transaction
+
+    def test_custom_field_index_command(self):
+        user = CustomUser.objects.create_user(email='index@example.com', name='Index', password='testpass')
+        out = io.StringIO()
+        call_command('custom_field_index', 'create', field='experience', stdout=out)
+        call_command('custom_field_index', 'create', gin=True, stdout=out)
+        listed = io.StringIO()
+        call_command('custom_field_index', 'list', stdout=listed)
+        self.assertEqual(len(listed.getvalue().splitlines()), 2)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                queryset = filter_custom_fields(Employee.objects.filter(user=user), {'cf.experience__gte': '5'},
+                                                {'experience': int})
+                self.assertIn('employee_cf_all_', queryset.explain())
+            finally:
+                cursor.execute('RESET enable_seqscan')
+
+        call_command('custom_field_index', 'drop', field='experience', stdout=out)
+        call_command('custom_field_index', 'drop', gin=True, stdout=out)
+
+
+class TestCustomFieldMigration(TransactionTestCase):
+    # Migrates back to before the (user, field_name) constraint, the schema is restored after each test
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('employees', target)])
+        return executor.loader.project_state([('employees', target)]).apps
+
+    def setUp(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes('employees')[0][1]
+        self.addCleanup(self.migrate, latest)
+        apps = self.migrate('0005_employee_search_indexes')
+        self.user = CustomUser.objects.create_user(email='migrate@example.com', name='Migrate', password='testpass')
+        self.CustomField = apps.get_model('employees', 'CustomField')
+        self.ids = [
+            self.CustomField.objects.create(user_id=self.user.id, field_name=field_name, field_type=field_type).id
+            for field_name, field_type in [('age', 'number'), ('team', 'text'), ('age', 'number'), ('team', 'text')]
+        ]
+
+    def test_identical_duplicates_are_merged(self):
+        self.migrate('0006_employee_user_indexes')
+        self.assertEqual(sorted(CustomField.objects.values_list('field_name', 'field_type')), [('age', 'number'), ('team', 'text')])
+
+    def test_conflicting_duplicates_stop_the_migration(self):
+        extra = self.CustomField.objects.create(user_id=self.user.id, field_name='age', field_type='text')
+        message = f"user {self.user.id}, 'age': id {self.ids[0]} (number), id {self.ids[2]} (number), id {extra.id} (text)"
+        with self.assertRaisesMessage(ValueError, message):
+            self.migrate('0006_employee_user_indexes')
+        self.assertEqual(self.CustomField.objects.count(), 5)
+        # Resolved by hand, the migration goes through
+        extra.delete()
+        self.migrate('0006_employee_user_indexes')
+        self.assertEqual(CustomField.objects.count(), 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning is only supported on PostgreSQL')
+class TestEmployeePartitioning(TransactionTestCase):
+    # Converts the employee table, the plain table is recreated after each test
+    client_class = APIClient
+
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(email=f'tenant{i}@example.com', name=f'Tenant {i}', password='testpass')
+            for i in range(3)
+        ]
+        for user in self.users:
+            Employee.objects.bulk_create(
+                Employee(user=user, name=f'Employee {i}', email=f'{user.id}-{i}@example.com', phone_number=str(i),
+                         custom_fields={'experience': i})
+                for i in range(5)
+            )
+        self.addCleanup(self.restore_table)
+
+    def restore_table(self):
+        partitioning.abort_conversion(connection)
+        with connection.schema_editor() as editor:
+            editor.delete_model(Employee)
+            editor.execute(f'DROP TABLE IF EXISTS {editor.quote_name(partitioning.EMAIL_GUARD)}')
+            editor.execute(f'DROP FUNCTION IF EXISTS {editor.quote_name(partitioning.EMAIL_GUARD_FUNCTION)}()')
+            editor.create_model(Employee)
+
+    def assertEmailTaken(self, user, email):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Employee.objects.create(user=user, name='Copy', email=email, phone_number='1')
+
+    def rows(self):
+        return sorted(Employee.objects.values_list('id', 'user_id', 'name', 'email', 'custom_fields'))
+
+    def test_convert_keeps_rows_and_mirrors_writes(self):
+        before = self.rows()
+        max_id = before[-1][0]
+        changed = {}
+
+        def on_progress(copied, last_id):
+            # Writes between batches reach the copy through the trigger
+            if not changed:
+                first, last = Employee.objects.order_by('id')[0], Employee.objects.order_by('-id')[0]
+                Employee.objects.filter(id=first.id).update(name='Renamed')
+                Employee.objects.filter(id=last.id).delete()
+                changed['added'] = Employee.objects.create(user=self.users[1], name='Late', email='late@example.com',
+                                                           phone_number='9').id
+                changed['rows'] = self.rows()
+
+        partitioning.convert_to_partitions(connection, 'hash', partitions=4, batch_size=4, on_progress=on_progress)
+        method, partitions = partitioning.partitioning_info(connection)
+        self.assertEqual((method, len(partitions)), ('hash', 4))
+        self.assertEqual(self.rows(), changed['rows'])
+        self.assertGreater(changed['added'], max_id)
+
+        # New ids continue after the old table's, queries are pruned to the user's partition
+        user = self.users[0]
+        employee = Employee.objects.create(user=user, name='New', email='new@example.com', phone_number='1')
+        self.assertGreater(employee.id, changed['added'])
+        plan = Employee.objects.filter(user=user).explain()
+        self.assertEqual(sum(name in plan for name, _, _ in partitions), 1)
+        self.assertIn(partitioning.user_partition(connection, user.id), plan)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + get_tokens(user)['access'])
+        response = self.client.get('/employee/api/employees/')
+        self.assertEqual(len(response.data), 6)
+        response = self.client.patch(f'/employee/api/employees/{employee.id}/', {'name': 'Newer'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post('/employee/api/employees/', {
+            'name': 'Copy', 'email': 'late@example.com', 'phone_number': '1',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Email stays unique across users in the database, released emails can be taken again
+        self.assertEmailTaken(self.users[2], 'late@example.com')
+        self.assertEmailTaken(self.users[2], f'{user.id}-1@example.com')
+        Employee.objects.filter(email='late@example.com').update(email='later@example.com')
+        Employee.objects.filter(email=f'{user.id}-1@example.com').delete()
+        Employee.objects.create(user=self.users[2], name='Reuse', email='late@example.com', phone_number='1')
+        Employee.objects.create(user=self.users[2], name='Reuse', email=f'{user.id}-1@example.com', phone_number='1')
+        self.assertEmailTaken(self.users[0], 'later@example.com')
+
+        # A duplicate that gets past validation is still a 400
+        with mock.patch('employees.serializer.EmployeeSerializer.is_valid', return_value=True), \
+                mock.patch('employees.serializer.EmployeeSerializer.save', side_effect=IntegrityError):
+            response = self.client.post('/employee/api/employees/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_list_partitions_and_commands(self):
+        out = io.StringIO()
+        call_command('partition_employees', 'convert', method='list', batch_size=5, stdout=out)
+        self.assertIn('list partitioned', out.getvalue())
+
+        user = CustomUser.objects.create_user(email='latecomer@example.com', name='Late', password='testpass')
+        Employee.objects.create(user=user, name='Late', email='late@example.com', phone_number='1')
+        self.assertEqual(partitioning.user_partition(connection, user.id), partitioning.DEFAULT_PARTITION)
+        call_command('partition_employees', 'user', user=user.email, stdout=out)
+        self.assertEqual(partitioning.user_partition(connection, user.id), f'{Employee._meta.db_table}_u{user.id}')
+        self.assertEqual(Employee.objects.filter(user=user).count(), 1)
+        self.assertEmailTaken(self.users[0], 'late@example.com')
+
+        status_out = io.StringIO()
+        call_command('partition_employees', 'status', stdout=status_out)
+        # One partition per user plus the default one
+        self.assertEqual(len(status_out.getvalue().splitlines()), 1 + len(self.users) + 2)
+
+        call_command('custom_field_index', 'create', field='experience', stdout=out)
+        call_command('custom_field_index', 'create', field='experience', user=user.email, stdout=out)
+        listed = io.StringIO()
+        call_command('custom_field_index', 'list', stdout=listed)
+        # The parent's index, one per partition and the user's own
+        self.assertEqual(len(listed.getvalue().splitlines()), 1 + len(self.users) + 2 + 1)
+        call_command('custom_field_index', 'drop', field='experience', stdout=out)
+        call_command('custom_field_index', 'drop', field='experience', user=user.email, stdout=out)
+        listed = io.StringIO()
+        call_command('custom_field_index', 'list', stdout=listed)
+        self.assertEqual(listed.getvalue(), '')
+
+        with self.assertRaises(CommandError):
+            call_command('partition_employees', 'convert', stdout=out)
+        with mock.patch('employees.management.commands.custom_field_index.user_partition', return_value=None), \
+                self.assertRaises(CommandError):
+            call_command('custom_field_index', 'create', field='experience', user=user.email, stdout=out)
+
+    def test_migration_only_partitions_an_empty_table(self):
+        # The migration's schema change copies nothing, a table with rows waits for the command
+        self.assertFalse(partitioning.partition_empty_table(connection, 'hash', partitions=4))
+        self.assertIsNone(partitioning.partitioning_info(connection)[0])
+        self.assertNotIn(partitioning.EMAIL_GUARD, connection.introspection.table_names())
+
+        Employee.objects.all().delete()
+        self.assertTrue(partitioning.partition_empty_table(connection, 'hash', partitions=4))
+        self.assertEqual(partitioning.partitioning_info(connection)[0], 'hash')
+        self.assertFalse(partitioning.partition_empty_table(connection, 'hash', partitions=4))
+
+        # The database keeps the constraint the model declares, under its name
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Employee._meta.db_table)
+        self.assertEqual(constraints[partitioning.USER_EMAIL_CONSTRAINT]['columns'], ['user_id', 'email'])
+        self.assertTrue(constraints[partitioning.USER_EMAIL_CONSTRAINT]['unique'])
+        self.assertIn(partitioning.USER_EMAIL_CONSTRAINT, [constraint.name for constraint in Employee._meta.constraints])
+        employee = Employee.objects.create(user=self.users[0], name='New', email='new@example.com', phone_number='1')
+        self.assertEqual(EmployeeEmailGuard.objects.get().email, employee.email)
+
+    def test_temporary_index_names_stay_apart(self):
+        long_name = 'employee_' + 'x' * 60
+        names = {partitioning._temporary_index_name(long_name + suffix) for suffix in ('a', 'b')}
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(len(name) <= 63 for name in names))
+
+
+class TestEmployeeCache(UserAPITestCase):
+    email = 'cache@example.com'
+
+    def setUp(self):
+        super().setUp()
+        self.custom_field = CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        self.employee = Employee.objects.create(user=self.user, name='Ann', email='ann@example.com',
+                                                phone_number='1', custom_fields={'experience': 3})
+        self.detail_url = f'/employee/api/employees/{self.employee.id}/'
+
+    def test_list_and_retrieve_are_cached(self):
+        before = cache_metrics()
+        self.client.get('/employee/api/employees/')
+        self.client.get(self.detail_url)
+        # Warm entries only cost the authentication query
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.client.get('/employee/api/employees/').data), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.detail_url).data['name'], 'Ann')
+        after = cache_metrics()
+        self.assertEqual(after['hits'] - before['hits'], 2)
+        self.assertEqual(after['misses'] - before['misses'], 2)
+
+    def test_writes_invalidate_cached_data(self):
+        self.client.get('/employee/api/employees/')
+        self.client.get(self.detail_url)
+
+        self.client.patch(self.detail_url, {'name': 'Ann Lee'}, format='json')
+        self.assertEqual(self.client.get(self.detail_url).data['name'], 'Ann Lee')
+
+        self.client.post('/employee/api/employees/', {'name': 'Ben', 'email': 'ben@example.com', 'phone_number': '2'}, format='json')
+        self.assertEqual(len(self.client.get('/employee/api/employees/').data), 2)
+
+        self.client.delete(f'/employee/api/custom-fields/{self.custom_field.id}/')
+        self.assertEqual(self.client.get(self.detail_url).data['custom_fields'], {})
+
+        self.client.delete(self.detail_url)
+        self.assertEqual(self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_get(self):
+        response = self.client.get('/employee/api/employees/')
+        etag = response['ETag']
+        # Whole second dates would miss writes within the same second, only the ETag validates
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get('/employee/api/employees/', HTTP_IF_MODIFIED_SINCE='Sun, 01 Jan 2040 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # An unchanged collection answers 304 after the version check, no employee query
+        with self.assertNumQueries(1):
+            response = self.client.get('/employee/api/employees/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Every URL has its own validator, the query string order doesn't matter
+        detail_etag = self.client.get(self.detail_url)['ETag']
+        self.assertNotEqual(detail_etag, etag)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get('/employee/api/employees/?search=a&ordering=name')['ETag'],
+                         self.client.get('/employee/api/employees/?ordering=name&search=a')['ETag'])
+
+        # A pk that doesn't exist is a 404 whatever the validator
+        response = self.client.get('/employee/api/employees/999999/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Any write changes the ETag
+        updated_at = Employee.objects.get(id=self.employee.id).updated_at
+        self.client.post('/employee/api/employees/bulk/', [
+            {'op': 'update', 'id': self.employee.id, 'data': {'name': 'Ann Lee'}},
+        ], format='json')
+        self.assertGreater(Employee.objects.get(id=self.employee.id).updated_at, updated_at)
+        response = self.client.get('/employee/api/employees/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class TestEmployeeChangesFeed(UserAPITestCase):
+    email = 'changes@example.com'
+
+    def changes(self, token):
+        response = self.client.get(f'/employee/api/employees/changes/?since={token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def test_changes_feed(self):
+        custom_field = CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+        token = self.client.get('/employee/api/employees/changes/').data['next']
+
+        ann = self.client.post('/employee/api/employees/', {'name': 'Ann', 'email': 'ann@example.com', 'phone_number': '1'}, format='json').data
+        ben = self.client.post('/employee/api/employees/', {'name': 'Ben', 'email': 'ben@example.com', 'phone_number': '2'}, format='json').data
+        self.client.patch(f"/employee/api/employees/{ann['id']}/", {'name': 'Ann Lee'}, format='json')
+        self.client.delete(f"/employee/api/employees/{ben['id']}/")
+        self.client.delete(f'/employee/api/custom-fields/{custom_field.id}/')
+
+        # Repeated changes collapse into the latest state, deletions come as tombstones
+        page = self.changes(token)
+        self.assertEqual(page['changes'], [
+            {'op': 'upsert', 'id': ann['id'], 'data': dict(ann, name='Ann Lee')},
+            {'op': 'delete', 'id': ben['id']},
+            {'op': 'field_removed', 'field_name': 'experience'},
+        ])
+        self.assertFalse(page['has_more'])
+
+        # Nothing new after the returned token
+        self.assertEqual(self.changes(page['next'])['changes'], [])
+
+    def test_compacted_tokens_must_resync(self):
+        token = self.client.get('/employee/api/employees/changes/').data['next']
+        self.client.post('/employee/api/employees/', {'name': 'Ann', 'email': 'ann@example.com', 'phone_number': '1'}, format='json')
+
+        call_command('compact_employee_changes', days=-1, stdout=io.StringIO())
+        response = self.client.get(f'/employee/api/employees/changes/?since={token}')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+        # A fresh head token works again
+        token = self.client.get('/employee/api/employees/changes/').data['next']
+        self.assertEqual(self.changes(token)['changes'], [])
+
+        response = self.client.get('/employee/api/employees/changes/?since=garbage')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compaction_is_per_user(self):
+        other = CustomUser.objects.create_user(email='other-changes@example.com', name='Other', password='testpass')
+        token = self.client.get('/employee/api/employees/changes/').data['next']
+        self.client.post('/employee/api/employees/', {'name': 'Ann', 'email': 'ann@example.com', 'phone_number': '1'}, format='json')
+        other_token = head_token(other)
+        employee = Employee.objects.create(user=other, name='Olga', email='olga@example.com', phone_number='2')
+        record_changes(other, EmployeeChange.UPSERT, [employee.id])
+
+        # Only this user's entries are old enough, the other user's newer ids stay replayable
+        EmployeeChange.objects.filter(user=self.user).update(created_at=timezone.now() - timedelta(days=2))
+        call_command('compact_employee_changes', days=1, stdout=io.StringIO())
+        response = self.client.get(f'/employee/api/employees/changes/?since={token}')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual([change['id'] for change in changes_since(other, decode_token(other_token))['changes']],
+                         [employee.id])
+
+
+class TestAsyncEmployeeViews(UserAPITestCase):
+
+    email = 'async@example.com'
+
+    def setUp(self):
+        super().setUp()
+        self.employee = Employee.objects.create(
+            user=self.user, name='Ann', email='ann@example.com', phone_number='1', custom_fields={},
+        )
+        self.factory = AsyncRequestFactory()
+        self.headers = {'authorization': 'Bearer ' + get_tokens(self.user)['access']}
+
+    async def test_list_matches_sync(self):
+        sync_response = await sync_to_async(self.client.get)('/employee/api/employees/?search=Ann')
+        await cache.aclear()
+        response = await async_views.employee_list(self.factory.get('/employee/api/employees/', {'search': 'Ann'}, headers=self.headers))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, sync_response.content)
+
+    async def test_detail(self):
+        path = f'/employee/api/employees/{self.employee.id}/'
+        response = await async_views.employee_detail(self.factory.get(path, headers=self.headers), pk=self.employee.id)
+        self.assertEqual(json.loads(response.content)['name'], 'Ann')
+
+        # Conditional GETs are answered like in the sync views
+        request = self.factory.get(path, headers=dict(self.headers, if_none_match=response['ETag']))
+        self.assertEqual((await async_views.employee_detail(request, pk=self.employee.id)).status_code, 304)
+
+        path = f'/employee/api/employees/{self.employee.id + 1}/'
+        response = await async_views.employee_detail(self.factory.get(path, headers=self.headers), pk=self.employee.id + 1)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        request = self.factory.get(path, headers=dict(self.headers, if_none_match='*'))
+        self.assertEqual((await async_views.employee_detail(request, pk=self.employee.id + 1)).status_code, 404)
+
+    async def test_projection_matches_sync(self):
+        for path in ['/employee/api/employees/', f'/employee/api/employees/{self.employee.id}/']:
+            sync_response = await sync_to_async(self.client.get)(path + '?fields=name,email')
+            await cache.aclear()
+            request = self.factory.get(path, {'fields': 'name,email'}, headers=self.headers)
+            if path.endswith('employees/'):
+                response = await async_views.employee_list(request)
+            else:
+                response = await async_views.employee_detail(request, pk=self.employee.id)
+            self.assertEqual(response.content, sync_response.content)
+
+    async def test_requires_authentication(self):
+        response = await async_views.employee_list(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+    async def test_writes_use_viewset(self):
+        request = self.factory.patch('/', {'name': 'Ann Lee'}, content_type='application/json', headers=self.headers)
+        response = await async_views.employee_detail(request, pk=self.employee.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((await Employee.objects.aget(pk=self.employee.id)).name, 'Ann Lee')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locks are only checked on PostgreSQL')
+class TestChangesFeedOrdering(TransactionTestCase):
+
+    def test_changes_wait_for_earlier_writers_of_the_user(self):
+        user = CustomUser.objects.create_user(email='ordering@example.com', name='Ordering', password='testpass')
+        # Another transaction in the middle of recording the user's changes
+        writer = connections.create_connection('default')
+        self.addCleanup(writer.close)
+        writer.set_autocommit(False)
+        with writer.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {CustomUser._meta.db_table} WHERE id = %s FOR NO KEY UPDATE', [user.id])
+
+        with self.assertRaises(OperationalError), transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = '100ms'")
+            record_changes(user, EmployeeChange.UPSERT, [1])
+        writer.rollback()
+        with transaction.atomic():
+            record_changes(user, EmployeeChange.UPSERT, [1])
+        self.assertEqual(EmployeeChange.objects.filter(user=user).count(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Connection reuse is only checked on PostgreSQL')
+class TestDatabaseConnections(TransactionTestCase):
+    # Drives a separate connection the way the request_started/finished handlers do
+
+    def new_connection(self, **settings_dict):
+        wrapper = connections.create_connection('default')
+        wrapper.settings_dict.update(settings_dict)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def request(self, wrapper):
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        wrapper.close_if_unusable_or_obsolete()
+
+    def connects(self):
+        return database_metrics()['default']['connects']
+
+    def test_connection_per_request(self):
+        wrapper = self.new_connection(CONN_MAX_AGE=0)
+        before = self.connects()
+        self.request(wrapper)
+        self.request(wrapper)
+        self.assertEqual(self.connects() - before, 2)
+
+    def test_persistent_connection(self):
+        wrapper = self.new_connection(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        before = self.connects()
+        self.request(wrapper)
+        self.request(wrapper)
+        self.assertEqual(self.connects() - before, 1)
+
+        # A connection the server dropped is replaced on the next request instead of failing it
+        raw = wrapper.connection
+        pid = raw.info.backend_pid if hasattr(raw, 'info') else raw.get_backend_pid()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        before = self.connects()
+        self.request(wrapper)
+        self.assertEqual(self.connects() - before, 1)
+
+    @skipUnless(importlib.util.find_spec('psycopg_pool'), 'psycopg_pool is not installed')
+    def test_pool(self):
+        wrapper = self.new_connection(CONN_MAX_AGE=0, OPTIONS={'pool': {'min_size': 1, 'max_size': 2, 'timeout': 5}})
+        self.addCleanup(wrapper.close_pool)
+        self.request(wrapper)
+        self.request(wrapper)
+
+        stats = database_metrics()['default']['pool']
+        self.assertEqual(stats['pool_max'], 2)
+        self.assertLessEqual(stats['pool_size'], 2)
+        self.assertEqual(stats['requests_num'], 2)
+        self.assertEqual(stats.get('requests_waiting', 0), 0)
+
+
+class TestPoolSettings(SimpleTestCase):
+
+    def load_settings(self, **environ):
+        environ = {**environ, **{key: 'x' for key in ('DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT')}}
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'user_managment_app', 'settings.py'))
+
+    def test_pool_mode_needs_psycopg3(self):
+        with mock.patch.dict(sys.modules, {'psycopg_pool': None}), \
+                self.assertRaisesMessage(ImproperlyConfigured, 'psycopg[binary,pool]'):
+            self.load_settings(DB_CONN_MODE='pool')
+
+    def test_persistent_mode(self):
+        database = self.load_settings(DB_CONN_MODE='persistent', DB_CONN_MAX_AGE='30')['DATABASES']['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 30)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', database['OPTIONS'])
+
+        database = self.load_settings(DB_CONN_MODE='none')['DATABASES']['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertFalse(database['CONN_HEALTH_CHECKS'])
+
+    def test_unknown_mode(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "not 'pooled'"):
+            self.load_settings(DB_CONN_MODE='pooled')
+
+
+class TestLogging(SimpleTestCase):
+
+    def record(self, level=logging.INFO, **extra):
+        record = logging.makeLogRecord({'name': 'employees.view', 'levelno': level, 'levelname': logging.getLevelName(level),
+                                        'msg': 'Employee created successfully: %s', 'args': (1,)})
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter(self):
+        built = []
+        formatter = JSONFormatter(redact=['email', 'custom_fields'])
+        entry = json.loads(formatter.format(self.record(
+            payload={'id': 1, 'email': 'ann@example.com', 'custom_fields': {'age': 30}},
+            lazy=lambda: built.append(1) or 'built',
+        )))
+        self.assertEqual(entry['message'], 'Employee created successfully: 1')
+        self.assertEqual(entry['payload'], {'id': 1, 'email': '[redacted]', 'custom_fields': '[redacted]'})
+        self.assertEqual(entry['lazy'], 'built')
+        self.assertEqual(built, [1])
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter(rate=0)
+        self.assertFalse(sampler.filter(self.record()))
+        self.assertTrue(sampler.filter(self.record(logging.WARNING)))
+
+    def test_queue_handler(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'employees.log')
+            handler = QueueLogHandler(filename=path, console=False, queue_size=1, redact=['email'])
+            handler.listener.stop()  # Nothing is written until restarted, so the queue fills up
+
+            handler.handle(self.record(payload={'email': 'ann@example.com'}))
+            handler.handle(self.record())
+            self.assertEqual(handler.dropped, 1)
+
+            handler.listener.start()
+            handler.close()
+            with open(path) as log_file:
+                lines = [json.loads(line) for line in log_file]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['payload'], {'email': '[redacted]'})
+
+
+class TestRequestMetrics(UserAPITestCase):
+
+    email = 'metrics@example.com'
+
+    def metric(self, line_prefix):
+        body = self.client.get('/metrics').content.decode()
+        values = [float(line.rsplit(' ', 1)[1]) for line in body.splitlines() if line.startswith(line_prefix)]
+        return values[0] if values else 0.0
+
+    def test_request_metrics(self):
+        route = '{method="GET",route="employee-list"}'
+        requests_before = self.metric('http_request_db_queries_count' + route)
+        queries_before = self.metric('http_request_db_queries_sum' + route)
+
+        Employee.objects.create(user=self.user, name='Ann', email='ann@example.com', phone_number='1')
+        response = self.client.get('/employee/api/employees/')
+
+        self.assertEqual(self.metric('http_request_db_queries_count' + route), requests_before + 1)
+        # User lookup and the employee list
+        self.assertEqual(self.metric('http_request_db_queries_sum' + route), queries_before + 2)
+        self.assertGreater(self.metric('http_request_serializer_duration_seconds_sum' + route), 0)
+        self.assertGreaterEqual(self.metric('http_response_size_bytes_sum' + route), len(response.content))
+        self.assertGreater(self.metric('http_request_duration_seconds_count{method="GET",route="employee-list",status="200"}'), 0)
+
+    def test_slow_request_logging(self):
+        with mock.patch('employees.middleware.SLOW_REQUEST_MS', 0.001), \
+                self.assertLogs('employees.view', 'WARNING') as logs:
+            self.client.get('/employee/api/employees/')
+        self.assertIn('Slow request: GET /employee/api/employees/', logs.output[0])
+        self.assertIn('SELECT', logs.records[0].sql[-1]['sql'])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', response.content.decode())
+
+
+class TestBenchCommand(APITestCase):
+
+    @property
+    def database(self):
+        return str(connection.settings_dict['NAME'])
+
+    def test_bench(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('bench', users=1, employees=5, custom_fields=2, requests=3, serialization=5, wire_formats=5,
+                         accept_encoding='gzip', json=path, allow_write=self.database, stdout=io.StringIO())
+            with open(path) as report_file:
+                report = json.load(report_file)
+
+            # Comparing a run with itself finds no regressions
+            call_command('bench', users=1, employees=5, custom_fields=2, requests=3, scenarios='list',
+                         compare=path, max_regression=100, allow_write=self.database, stdout=io.StringIO())
+
+        wire_formats = report['results'].pop('wire_formats')
+        self.assertLess(wire_formats['formats']['json+gzip']['bytes'], wire_formats['formats']['json+identity']['bytes'])
+        serialization = report['results'].pop('serialization')
+        self.assertEqual(serialization['rows'], 5)
+        self.assertTrue(serialization['identical'])
+        self.assertEqual(set(report['results']), {'list', 'search', 'retrieve', 'stats', 'create', 'update', 'bulk', 'login'})
+        for result in report['results'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries_per_request'], 0)
+        self.assertFalse(CustomUser.objects.filter(email__startswith='bench-').exists())
+
+    def test_bench_needs_the_database_name(self):
+        for allow_write in ['', 'production']:
+            with self.assertRaisesMessage(CommandError, f'--allow-write {self.database}'):
+                call_command('bench', users=1, employees=1, requests=1, allow_write=allow_write, stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, '--custom-fields 1'):
+            call_command('bench', custom_fields=0, scenarios='stats', allow_write=self.database, stdout=io.StringIO())
+        self.assertFalse(CustomUser.objects.filter(email__startswith='bench-').exists())
+
+    def test_stats_scenario_aggregates_a_number(self):
+        data = seed(1, 2, 2)
+        self.addCleanup(cleanup, data)
+        method, path, _, token = build_request('stats', data, random.Random(0))
+        self.assertEqual(path, '/employee/api/employees/stats/?numeric=field_0&group_by=field_1')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+        stats = self.client.get(path).json()
+        self.assertEqual(stats['numeric']['field_0']['count'], 2)
+
+
+class TestFastSerialization(UserAPITestCase):
+
+    email = 'fast@example.com'
+
+    def setUp(self):
+        super().setUp()
+        for i, custom_fields in enumerate([
+            {'experience': 5, 'ratio': 2.5},
+            {'tiny': 1e-05, 'huge': 1e16, 'nested': {'a': [1, None, True]}},
+            {'note': 'line\u2028separator, café ☃'},
+        ]):
+            Employee.objects.create(user=self.user, name=f'Employee é {i}', email=f'e{i}@example.com',
+                                    phone_number=str(i), custom_fields=custom_fields)
+
+    def serializer_bytes(self, data):
+        return JSONRenderer().render(data)
+
+    def test_list_matches_serializer(self):
+        employees = Employee.objects.filter(user=self.user)
+        expected = self.serializer_bytes(EmployeeSerializer(employees, many=True).data)
+        self.assertEqual(self.client.get('/employee/api/employees/').content, expected)
+
+        response = self.client.get('/employee/api/employees/?page_size=2')
+        page = self.serializer_bytes(EmployeeSerializer(employees.order_by('id')[:2], many=True).data)
+        self.assertIn(b'"results":' + page, response.content)
+
+    def test_renderer_matches_json_renderer(self):
+        for data in [
+            {'a': 1, 'b': [1.5, 'x', None, True], 'c': {'d': '\u2029'}},
+            [{'float': 0.1 + 0.2}, {'small': 1.5e-07}],
+            {'big': 2 ** 70, 'decimal': Decimal('1.10')},
+            {1: 'int key'},
+        ]:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class TestResponseCompression(UserAPITestCase):
+    email = 'compression@example.com'
+
+    def setUp(self):
+        super().setUp()
+        Employee.objects.bulk_create(
+            Employee(user=self.user, name=f'Employee {i}', email=f'e{i}@example.com', phone_number=str(i))
+            for i in range(40)
+        )
+        self.plain = self.client.get('/employee/api/employees/').content
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(negotiate_encoding(''))
+        self.assertIsNone(negotiate_encoding('identity, gzip;q=0'))
+        self.assertEqual(negotiate_encoding('*'), next(e for e in ('zstd', 'br', 'gzip') if e in CODECS))
+        if 'br' in CODECS:
+            self.assertEqual(negotiate_encoding('br;q=0.5, gzip'), 'gzip')
+
+    def test_list_is_compressed(self):
+        for encoding in CODECS:
+            cache.clear()
+            response = self.client.get('/employee/api/employees/', headers={'accept-encoding': encoding})
+            self.assertEqual(response['Content-Encoding'], encoding)
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertLess(len(response.content), len(self.plain))
+            if encoding == 'gzip':
+                self.assertEqual(zlib.decompress(response.content, 31), self.plain)
+
+    def test_small_responses_are_not_compressed(self):
+        with mock.patch.object(middleware, 'COMPRESSION_MIN_SIZE', len(self.plain) + 1):
+            response = self.client.get('/employee/api/employees/', headers={'accept-encoding': 'gzip'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.plain)
+
+    def test_streamed_export(self):
+        plain = b''.join(self.client.get('/employee/api/employees/export/?output=ndjson').streaming_content)
+        response = self.client.get('/employee/api/employees/export/?output=ndjson', headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(zlib.decompress(b''.join(response.streaming_content), 31), plain)
+
+
+@skipUnless(importlib.util.find_spec('msgpack'), 'msgpack is not installed')
+class TestMessagePack(UserAPITestCase):
+    email = 'msgpack@example.com'
+
+    def setUp(self):
+        super().setUp()
+        CustomField.objects.create(user=self.user, field_name='experience', field_type='number')
+
+    def request(self, method, path, data=None):
+        import msgpack
+        response = self.client.generic(
+            method, path, msgpack.packb(data) if data is not None else b'', content_type='application/msgpack',
+            headers={'accept': 'application/msgpack'},
+        )
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        return response.status_code, msgpack.unpackb(response.content)
+
+    def test_employees(self):
+        status_code, created = self.request('POST', '/employee/api/employees/', {
+            'name': 'Ann', 'email': 'ann@example.com', 'phone_number': '1', 'custom_fields': {'experience': 2.5},
+        })
+        self.assertEqual(status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.request('GET', '/employee/api/employees/'), (200, [created]))
+        self.assertEqual(self.request('GET', '/employee/api/employees/'), (200, self.client.get('/employee/api/employees/').json()))
+
+    def test_custom_fields(self):
+        status_code, created = self.request('POST', '/employee/api/custom-fields/', {'field_name': 'age', 'field_type': 'number'})
+        self.assertEqual(status_code, status.HTTP_201_CREATED)
+        self.assertEqual(created['field_name'], 'age')
+
+    def test_invalid_body(self):
+        response = self.client.post('/employee/api/custom-fields/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
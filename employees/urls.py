@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import EmployeeViewSet,CustomFieldViewSet
@@ -9,3 +10,12 @@ router.register(r'custom-fields', CustomFieldViewSet, basename='customfield')
 urlpatterns = [
     path('api/', include(router.urls)),
 ]
+
+if settings.API_MODE == 'async':
+    from . import async_views
+
+    # Ahead of the router, which still serves the other employee actions and custom fields
+    urlpatterns = [
+        path('api/employees/', async_views.employee_list, name='employee-list'),
+        path('api/employees/<int:pk>/', async_views.employee_detail, name='employee-detail'),
+    ] + urlpatterns
@@ -1,49 +1,92 @@
 from rest_framework import viewsets
-from .models import Employee,CustomField
-from .serializer import EmployeeSerializer,CustomFieldSerializer
+from .models import Employee,CustomField,EmployeeChange
+from .serializer import EmployeeSerializer,CustomFieldSerializer,employee_rows
+from .pagination import EmployeeCursorPagination
+from .search import search_employees
+from .bulk import apply_bulk_operations, BULK_MAX_OPERATIONS
+from .importer import detect_format, import_employees, text_stream, IMPORT_FORMATS
+from .exporter import export_employees, EXPORT_FORMATS
+from .custom_fields import convert_custom_field_values, remove_custom_field_values
+from .schema import get_custom_field_schema, get_custom_field_validators, invalidate_custom_field_schema
+from .stats import employee_stats
+from .filters import filter_custom_fields, order_employees, CUSTOM_FIELD_PREFIX
+from .projection import parse_projection, project_rows, shape_rows
+from .renderers import MessagePackRenderer, msgpack
+from .parsers import MessagePackParser
+from .changes import record_changes, record_field_removed, changes_since, head_token, decode_token, ResyncRequired
+from .cache import (
+    cached_employee_data, bump_collection_version, collection_version, collection_etag,
+)
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
-from django.db import transaction
+from rest_framework.settings import api_settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 import logging
 
 
 
 logger = logging.getLogger('employees.view')
 
+# With msgpack installed the employee and custom field APIs also speak application/msgpack,
+# picked with the Accept and Content-Type headers
+MSGPACK_RENDERERS = [MessagePackRenderer] if msgpack else []
+MSGPACK_PARSERS = [MessagePackParser] if msgpack else []
+
+# Answer to a unique email violation that slipped past validation, e.g. two requests at once
+EMAIL_TAKEN = {'email': ['employee with this email already exists.']}
+
 class EmployeeViewSet(viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = EmployeeCursorPagination
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *MSGPACK_RENDERERS]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, *MSGPACK_PARSERS]
 
-   def get_queryset(self):
+    def get_queryset(self):
         queryset = Employee.objects.filter(user=self.request.user)
         
         # Get the 'search' query parameter
         search = self.request.query_params.get('search', None)
         if search:
-            # Filter by name, email, or phone number
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(phone_number__icontains=search)
-            )
-            
+            # Filter by name, email, or phone number prefix
+            queryset = search_employees(queryset, search)
+
+        # Filters and ordering on custom field values, e.g. ?cf.experience__gte=5&ordering=-cf.experience
+        params = self.request.query_params
+        ordering = params.get('ordering')
+        if ordering or any(param.startswith(CUSTOM_FIELD_PREFIX) for param in params):
+            validators = get_custom_field_validators(self.request.user.id)
+            queryset = filter_custom_fields(queryset, params, validators)
+            if ordering:
+                queryset = order_employees(queryset, ordering, validators)
+
         return queryset
 
     def create(self, request):
         try:
-            request.data['user'] = request.user.id
             serializer = self.get_serializer(data=request.data)
 
             if serializer.is_valid():
-                serializer.save()
-                logger.info('Employee created successfully: %s', serializer.data)
+                with transaction.atomic():
+                    employee = serializer.save(user=request.user)
+                    record_changes(request.user, EmployeeChange.UPSERT, [employee.id])
+                bump_collection_version(request.user.id)
+                logger.info('Employee created successfully: %s', serializer.data['id'], extra={'payload': serializer.data})
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
             logger.warning('Failed to create employee: %s', serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError as e:
+            # The email was stored by a concurrent request after validation
+            logger.warning('Failed to create employee: %s', e)
+            return Response(EMAIL_TAKEN, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error('Error creating employee: %s', e)
             return Response({'error': 'An error occurred while creating the employee.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -57,12 +100,18 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(employee, data=request.data, partial=True)
 
             if serializer.is_valid():
-                serializer.save()
-                logger.info('Employee updated successfully: %s', serializer.data)
+                with transaction.atomic():
+                    serializer.save()
+                    record_changes(request.user, EmployeeChange.UPSERT, [employee.id])
+                bump_collection_version(request.user.id)
+                logger.info('Employee updated successfully: %s', serializer.data['id'], extra={'payload': serializer.data})
                 return Response(serializer.data)
 
             logger.warning('Failed to update employee: %s', serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError as e:
+            logger.warning('Failed to update employee: %s', e)
+            return Response(EMAIL_TAKEN, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error('Error updating employee: %s', e)
             return Response({'error': 'An error occurred while updating the employee.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -70,11 +119,60 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 
 
 
+    def cached_response(self, request, kind, build):
+        # If-None-Match on the list and stats is answered from the collection version alone,
+        # before any employee query or serialization. A detail is read (from the cache when
+        # warm) first, so a pk that doesn't exist is a 404 rather than a 304
+        version = collection_version(request.user.id)
+        etag = collection_etag(request.user.id, version, request.path, request.GET)
+
+        def data():
+            # Cached per user and query string, the host is part of it because pagination links are absolute
+            return cached_employee_data(
+                request.user.id, kind, (request.get_host(), request.get_full_path()), build, version=version,
+            )
+
+        detail = data() if kind == 'detail' else None
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(detail if detail is not None else data())
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization', 'Accept'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # ?fields= / ?cf= select only those columns and custom field keys in SQL
+        projection = parse_projection(request.query_params, request.user.id)
+
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            if projection is None:
+                rows = employee_rows(queryset)
+            else:
+                rows = project_rows(queryset, projection, request.query_params.get('ordering'))
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                if projection is not None:
+                    page = shape_rows(page, projection)
+                return self.get_paginated_response(page).data
+            return list(rows) if projection is None else shape_rows(rows, projection)
+
+        return self.cached_response(request, 'list', build)
+
     def retrieve(self, request, pk=None):
+        projection = parse_projection(request.query_params, request.user.id)
+
+        def build():
+            if projection is None:
+                return self.get_serializer(self.get_object()).data
+            rows = project_rows(self.filter_queryset(self.get_queryset()).filter(pk=pk), projection)
+            rows = shape_rows(rows, projection)
+            if not rows:
+                raise Employee.DoesNotExist
+            return rows[0]
+
         try:
-            employee = self.get_object()
-            serializer = self.get_serializer(employee)
-            return Response(serializer.data)
+            return self.cached_response(request, 'detail', build)
         except Exception as e:
             logger.error('Error retrieving employee: %s', e)
             return Response({'error': 'Employee not found.'}, status=status.HTTP_404_NOT_FOUND)
@@ -82,8 +180,12 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     def destroy(self, request, pk=None):
         try:
             employee = self.get_object()
-            employee.delete()
-            logger.info('Employee deleted successfully: %s', employee.id)
+            employee_id = employee.id
+            with transaction.atomic():
+                employee.delete()
+                record_changes(request.user, EmployeeChange.DELETE, [employee_id])
+            bump_collection_version(request.user.id)
+            logger.info('Employee deleted successfully: %s', employee_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             logger.error('Error deleting employee: %s', e)
@@ -91,16 +193,135 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 
 
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        # Accept either a bare list of operations or {"operations": [...]}
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(operations, list) or not operations:
+            return Response({'error': 'A non-empty list of operations is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > BULK_MAX_OPERATIONS:
+            return Response({'error': f'At most {BULK_MAX_OPERATIONS} operations are allowed per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = apply_bulk_operations(request.user, operations, self.get_serializer_context())
+        except IntegrityError as e:
+            # Nothing was written, the batch can be sent again
+            logger.warning('Bulk employee operations failed: %s', e)
+            return Response(EMAIL_TAKEN, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error('Error applying bulk employee operations: %s', e)
+            return Response({'error': 'An error occurred while applying the operations.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            bump_collection_version(request.user.id)
+
+        failed = sum(1 for result in results if result['status'] >= 400)
+        logger.info('Bulk employee operations applied: %s succeeded, %s failed', len(results) - failed, failed)
+        return Response({'results': results})
+
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A file upload is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response({'error': 'The file must be CSV or NDJSON.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the first rejections are returned, the counts cover the whole file
+        rejections = []
+
+        def on_reject(line_number, row, errors):
+            if len(rejections) < 100:
+                rejections.append({'line': line_number, 'errors': errors})
+
+        def on_progress(summary):
+            logger.debug('Employee import progress: %s', summary)
+
+        try:
+            summary = import_employees(
+                request.user, text_stream(upload.file), file_format,
+                on_progress=on_progress, on_reject=on_reject,
+            )
+        except Exception as e:
+            logger.error('Error importing employees: %s', e)
+            # Batches commit one by one, import_employees() already invalidated the cache for stored ones
+            return Response({'error': 'An error occurred while importing the employees.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        logger.info('Employees imported: %s', summary)
+        return Response(dict(summary, rejections=rejections), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        # ?output= rather than ?format=, which DRF reserves for renderer selection
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"Unsupported export format: {export_format}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            export_employees(request.user, self.get_queryset(), export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="employees.{export_format}"'
+        logger.info('Employee export started: %s', export_format)
+        return response
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        # Counts and custom field aggregates for dashboards, cached like the list until the next write
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            return employee_stats(queryset, request.query_params, get_custom_field_schema(request.user.id))
+
+        return self.cached_response(request, 'stats', build)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        # Without ?since= only the current position is returned, mirrors take it before a full export
+        since = request.query_params.get('since')
+        if not since:
+            return Response({'changes': [], 'next': head_token(request.user), 'has_more': False})
+
+        try:
+            page = changes_since(request.user, decode_token(since))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ResyncRequired:
+            return Response({'error': 'This token is older than the retained change history, resync from a full export.'},
+                            status=status.HTTP_410_GONE)
+        return Response(page)
+
+
 class CustomFieldViewSet(viewsets.ModelViewSet):
     queryset = CustomField.objects.all()
     serializer_class = CustomFieldSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *MSGPACK_RENDERERS]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, *MSGPACK_PARSERS]
 
     def get_queryset(self):
         return CustomField.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  # Automatically set the user
+        invalidate_custom_field_schema(self.request.user.id)
+        # Cached stats and their ETags depend on the field types too
+        bump_collection_version(self.request.user.id)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        field_type = serializer.validated_data.get('field_type', instance.field_type)
+        with transaction.atomic():
+            if field_type != instance.field_type:
+                # Stored values are converted to the new type, or the change is refused
+                try:
+                    changed = convert_custom_field_values(self.request.user, instance.field_name, field_type)
+                except ValueError as e:
+                    raise ValidationError({'field_type': str(e)})
+                record_changes(self.request.user, EmployeeChange.UPSERT, changed)
+            serializer.save()
+        invalidate_custom_field_schema(self.request.user.id)
+        bump_collection_version(self.request.user.id)
 
     def perform_destroy(self, instance):
         # Get the custom field name to clean up related Employee data
@@ -109,21 +330,17 @@ class CustomFieldViewSet(viewsets.ModelViewSet):
         try:
             # Start a transaction to ensure atomic updates
             with transaction.atomic():
-                # Get all employees related to the user
-                employees = Employee.objects.filter(user=self.request.user)
-
-                # Iterate over each employee and update their custom_fields
-                for employee in employees:
-                    custom_fields = employee.custom_fields
-                    if field_name in custom_fields:
-                        # Remove the custom field
-                        del custom_fields[field_name]
-                        # Update the employee record
-                        employee.custom_fields = custom_fields
-                        employee.save(update_fields=['custom_fields'])
-            logger.info('Custom field deleted and employees updated: %s', field_name)
-            # Now call the superclass method to delete the custom field
-            super().perform_destroy(instance)
+                # Remove the key from every employee of the user in one set-based update
+                updated = remove_custom_field_values(
+                    self.request.user, field_name,
+                    on_progress=lambda count: logger.debug('Custom field %s removed from %s employees', field_name, count),
+                )
+                record_field_removed(self.request.user, field_name)
+                # Now call the superclass method to delete the custom field
+                super().perform_destroy(instance)
+            invalidate_custom_field_schema(self.request.user.id)
+            bump_collection_version(self.request.user.id)
+            logger.info('Custom field deleted and employees updated: %s (%s employees)', field_name, updated)
         except Exception as e:
             logger.error('Error deleting custom field: %s', e)
             raise  # Re-raise the exception after logging
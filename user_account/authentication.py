@@ -0,0 +1,148 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import CustomUser
+
+
+# How long a user's is_active/is_staff may be served from the cache before it is re-read
+USER_CACHE_TTL = getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+# Claims get_tokens adds next to the user id
+USER_CLAIMS = ('is_active', 'is_staff')
+
+# Issue time in nanoseconds, iat has whole seconds only
+ISSUED_NS_CLAIM = 'iat_ns'
+
+
+def _state_key(user_id):
+    return f'auth:user-state:{user_id}'
+
+
+def _revoked_key(user_id):
+    return f'auth:revoked-before:{user_id}'
+
+
+def revoke_user_tokens(user_id):
+    # Tokens issued before now are rejected, the cached user state is dropped
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    cache.set(_revoked_key(user_id), time.time_ns(), lifetime)
+    cache.delete(_state_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user without loading CustomUser.
+
+    The user id, is_active and is_staff come from the signed token. A short-TTL cache
+    of the user's current is_active/is_staff bounds how long a deactivated user keeps
+    access, and revoke_user_tokens() cuts it off at once. Tokens without the claims
+    fall back to the regular database lookup.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        self.check_revoked(user_id, validated_token, cache.get(_revoked_key(user_id)))
+
+        state = cache.get(_state_key(user_id))
+        if state is None:
+            state = CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*USER_CLAIMS).first()
+            if state is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            cache.set(_state_key(user_id), state, USER_CACHE_TTL)
+
+        return self.user_from_state(user_id, validated_token, state)
+
+    async def aget_user(self, validated_token):
+        # get_user() for async views
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return await aget_token_user(validated_token)
+
+        self.check_revoked(user_id, validated_token, await cache.aget(_revoked_key(user_id)))
+
+        state = await cache.aget(_state_key(user_id))
+        if state is None:
+            state = await CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*USER_CLAIMS).afirst()
+            if state is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            await cache.aset(_state_key(user_id), state, USER_CACHE_TTL)
+
+        return self.user_from_state(user_id, validated_token, state)
+
+    def check_revoked(self, user_id, validated_token, revoked_before):
+        # Compared in nanoseconds, so a login right after a revocation is not rejected.
+        # Tokens without iat_ns count from the start of their second, markers stored in
+        # seconds by earlier versions cover their whole second
+        if revoked_before is None:
+            return
+        if revoked_before < 10 ** 12:
+            revoked_before = (revoked_before + 1) * 10 ** 9 - 1
+        issued = validated_token.get(ISSUED_NS_CLAIM, validated_token.get('iat', 0) * 10 ** 9)
+        if issued <= revoked_before:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+    def user_from_state(self, user_id, validated_token, state):
+        if not state['is_active'] or not validated_token['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        # An unsaved-looking instance would break FK filters, mark it as loaded from the database
+        user = CustomUser(**{api_settings.USER_ID_FIELD: user_id}, is_active=True, is_staff=state['is_staff'])
+        user._state.adding = False
+        user._state.db = CustomUser.objects.db
+        return user
+
+
+async def aget_token_user(validated_token):
+    # JWTAuthentication.get_user() on the async ORM
+    try:
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    try:
+        user = await CustomUser.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+    except CustomUser.DoesNotExist:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+    if not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user
+
+
+async def aauthenticate_request(request):
+    """
+    Authenticate a plain Django request with the configured JWT authentication class.
+
+    Returns (user, validated_token), or None when no credentials were sent. Token
+    parsing and validation are CPU only, the user lookup uses the async ORM.
+    """
+    from rest_framework.settings import api_settings as drf_settings
+
+    authentication = drf_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    validated_token = authentication.get_validated_token(raw_token)
+    if isinstance(authentication, StatelessJWTAuthentication):
+        return await authentication.aget_user(validated_token), validated_token
+    return await aget_token_user(validated_token), validated_token
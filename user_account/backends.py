@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from .models import CustomUser
+
+
+# Password hashing is CPU bound and releases the GIL, more workers than cores only adds
+# contention. Requests beyond that wait for a free worker instead of all hashing at once.
+PASSWORD_HASH_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', 0) or os.cpu_count() or 1
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+
+
+def pooled_verify_password(password, encoded):
+    # (is_correct, must_update), computed on the hashing pool
+    return _hash_pool.submit(verify_password, password, encoded).result()
+
+
+async def averify_password(password, encoded):
+    # Same for async views, the event loop keeps serving while the hash runs
+    return await asyncio.wrap_future(_hash_pool.submit(verify_password, password, encoded))
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that checks passwords on a bounded thread pool.
+
+    Only the hashing leaves the request thread, the user lookup and a hash upgrade
+    stay on the request's own database connection.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(CustomUser.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = CustomUser._default_manager.get_by_natural_key(username)
+        except CustomUser.DoesNotExist:
+            # Hash anyway, so a missing user answers as slowly as a wrong password
+            pooled_verify_password(password, '')
+            return None
+
+        is_correct, must_update = pooled_verify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+
+        if must_update:
+            # Re-encode with the configured hasher. A queryset update keeps it out of
+            # post_save, the password itself did not change so tokens stay valid
+            user.password = _hash_pool.submit(make_password, password).result()
+            CustomUser.objects.filter(pk=user.pk).update(password=user.password)
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        # Same as authenticate() on the async ORM, for the async login view
+        if username is None:
+            username = kwargs.get(CustomUser.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = await CustomUser._default_manager.aget(**{CustomUser.USERNAME_FIELD: username})
+        except CustomUser.DoesNotExist:
+            await averify_password(password, '')
+            return None
+
+        is_correct, must_update = await averify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+
+        if must_update:
+            user.password = await asyncio.wrap_future(_hash_pool.submit(make_password, password))
+            await CustomUser.objects.filter(pk=user.pk).aupdate(password=user.password)
+        return user
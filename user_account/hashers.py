@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+
+# Same algorithm names as Django's hashers, so existing hashes keep verifying and are
+# re-encoded with the configured cost on the next successful login.
+# A setting left at 0 keeps Django's default cost.
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', 0) or PBKDF2PasswordHasher.iterations
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', 0) or Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        # KiB
+        return getattr(settings, 'ARGON2_MEMORY_COST', 0) or Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', 0) or Argon2PasswordHasher.parallelism
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+
+    @property
+    def rounds(self):
+        return getattr(settings, 'BCRYPT_ROUNDS', 0) or BCryptSHA256PasswordHasher.rounds
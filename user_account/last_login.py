@@ -0,0 +1,76 @@
+import atexit
+import threading
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import CustomUser
+
+
+# user id -> last login not yet written, flushed as one bulk update
+_pending = {}
+_lock = threading.Lock()
+_timer = None
+
+
+def _flush_interval():
+    # Seconds a login may wait for its last_login write, 0 writes right away
+    return getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 0)
+
+
+def record_login(user):
+    """
+    Set user.last_login and queue the database write.
+
+    A login storm then costs one UPDATE per flush interval instead of one per login,
+    repeated logins of the same user collapse into one row.
+    """
+    global _timer
+    user.last_login = timezone.now()
+
+    interval = _flush_interval()
+    if not interval:
+        CustomUser.objects.filter(pk=user.pk).update(last_login=user.last_login)
+        return
+
+    with _lock:
+        _pending[user.pk] = user.last_login
+        if _timer is None:
+            _timer = threading.Timer(interval, _flush_from_timer)
+            _timer.daemon = True
+            _timer.start()
+
+
+async def arecord_login(user):
+    # record_login() for async views, only the immediate write touches the database
+    if not _flush_interval():
+        user.last_login = timezone.now()
+        await CustomUser.objects.filter(pk=user.pk).aupdate(last_login=user.last_login)
+        return
+    record_login(user)
+
+
+def flush_last_logins():
+    # Write all queued logins, returns how many users were updated
+    global _timer
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+
+    if pending:
+        users = [CustomUser(pk=user_id, last_login=last_login) for user_id, last_login in pending.items()]
+        CustomUser.objects.bulk_update(users, ['last_login'], batch_size=500)
+    return len(pending)
+
+
+def _flush_from_timer():
+    try:
+        flush_last_logins()
+    finally:
+        # The timer thread has its own connection, don't leave it open
+        connection.close()
+
+
+atexit.register(flush_last_logins)
@@ -0,0 +1,67 @@
+import os
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+from user_account.backends import PASSWORD_HASH_WORKERS
+from user_account.last_login import flush_last_logins
+from user_account.models import CustomUser
+from user_account.views import LoginView
+
+
+class Command(BaseCommand):
+    help = 'Run logins through LoginView in parallel and report logins/sec per core.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Number of logins.')
+        parser.add_argument('--concurrency', type=int, default=PASSWORD_HASH_WORKERS * 4, help='Logins in flight at once.')
+        parser.add_argument('--email', help='Log in as this existing user, a temporary user is created otherwise.')
+        parser.add_argument('--password', help='Password of --email.')
+
+    def handle(self, *args, **options):
+        if options['email'] and not options['password']:
+            raise CommandError('--password is required with --email.')
+
+        temporary = None
+        if options['email']:
+            email, password = options['email'], options['password']
+        else:
+            email, password = f'bench-login-{uuid.uuid4().hex}@example.com', uuid.uuid4().hex
+            temporary = CustomUser.objects.create_user(email=email, name='Login benchmark', password=password)
+
+        factory = APIRequestFactory()
+        view = LoginView.as_view()
+
+        def login(_):
+            started = time.perf_counter()
+            request = factory.post('/auth/api/login/', {'email': email, 'password': password}, format='json')
+            response = view(request)
+            return response.status_code, time.perf_counter() - started
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                started = time.perf_counter()
+                results = list(pool.map(login, range(options['requests'])))
+                elapsed = time.perf_counter() - started
+        finally:
+            flush_last_logins()
+            if temporary is not None:
+                temporary.delete()
+
+        failed = sum(1 for status_code, _ in results if status_code != 200)
+        if failed:
+            raise CommandError(f'{failed} of {len(results)} logins failed.')
+
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        latencies = sorted(latency for _, latency in results)
+        rate = len(results) / elapsed
+
+        self.stdout.write(f'hasher:          {get_hasher().algorithm}')
+        self.stdout.write(f'hash workers:    {PASSWORD_HASH_WORKERS}')
+        self.stdout.write(f'logins:          {len(results)} in {elapsed:.2f}s, concurrency {options["concurrency"]}')
+        self.stdout.write(f'latency p50/p95: {statistics.median(latencies) * 1000:.1f}ms / '
+                          f'{latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms')
+        self.stdout.write(self.style.SUCCESS(f'{rate:.1f} logins/sec, {rate / cores:.1f} logins/sec per core ({cores} cores)'))
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .authentication import revoke_user_tokens
+from .models import CustomUser
+
+
+# Saves that can change who may use existing tokens, last_login updates are not among them
+REVOKING_FIELDS = {'password', 'is_active', 'is_staff', 'is_superuser'}
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_tokens_on_account_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or REVOKING_FIELDS & set(update_fields):
+        revoke_user_tokens(instance.pk)
@@ -1,3 +1,140 @@
-from django.test import TestCase
+import json
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from employees.models import Employee
+from employees.views import EmployeeViewSet
+from .authentication import StatelessJWTAuthentication
+from .last_login import flush_last_logins
+from .models import CustomUser
+from .utils import get_tokens
+from .views import async_login
 
-# Create your tests here.
+
+class TestStatelessJWTAuthentication(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='stateless@example.com', name='Test User', password='testpass')
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, access):
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Bearer ' + access)
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_user_from_claims(self):
+        access = get_tokens(self.user)['access']
+        self.authenticate(access)  # Warms the user state cache
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(access)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_authenticated)
+        self.assertFalse(user.is_staff)
+
+    def test_list_needs_one_query(self):
+        Employee.objects.create(user=self.user, name='A', email='a@example.com', phone_number='1')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + get_tokens(self.user)['access'])
+
+        with mock.patch.object(EmployeeViewSet, 'authentication_classes', [StatelessJWTAuthentication]):
+            self.client.get('/employee/api/employees/')
+            with self.assertNumQueries(1):
+                response = self.client.get('/employee/api/employees/', {'search': 'A'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_revoked_on_deactivation(self):
+        access = get_tokens(self.user)['access']
+        self.authenticate(access)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_login_right_after_revocation(self):
+        old_access = get_tokens(self.user)['access']
+        self.user.set_password('newpass')
+        self.user.save()
+        # Issued within the same second as the revocation
+        access = get_tokens(self.user)['access']
+        user, _ = self.authenticate(access)
+        self.assertEqual(user.pk, self.user.pk)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(old_access)
+
+    def test_last_login_does_not_revoke(self):
+        access = get_tokens(self.user)['access']
+        self.user.save(update_fields=['last_login'])
+        user, _ = self.authenticate(access)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_token_without_claims_falls_back(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        user, _ = self.authenticate(access)
+        self.assertIsInstance(user, CustomUser)
+        self.assertEqual(user.email, self.user.email)
+
+
+class TestLogin(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='login@example.com', name='Test User', password='testpass')
+
+    def login(self, password='testpass'):
+        return self.client.post('/auth/api/login/', {'email': 'login@example.com', 'password': password}, format='json')
+
+    def test_login(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+        self.assertEqual(self.login('wrong').status_code, 401)
+        response = self.client.post('/auth/api/login/', {'email': 'nobody@example.com', 'password': 'testpass'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=60)
+    def test_last_login_batched(self):
+        self.login()
+        self.login()
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        self.assertEqual(flush_last_logins(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    @override_settings(
+        PASSWORD_HASHERS=['user_account.hashers.TunedPBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+        PBKDF2_ITERATIONS=1000,
+    )
+    def test_hash_upgraded_on_login(self):
+        # Old hash from another hasher, re-encoded with the configured one without revoking tokens
+        self.user.password = make_password('testpass', hasher='md5')
+        CustomUser.objects.filter(pk=self.user.pk).update(password=self.user.password)
+        access = get_tokens(self.user)['access']
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' + access)
+        self.assertIsNotNone(StatelessJWTAuthentication().authenticate(request))
+
+    async def test_async_login(self):
+        request = AsyncRequestFactory().post(
+            '/auth/api/login/', {'email': 'login@example.com', 'password': 'testpass'}, content_type='application/json',
+        )
+        response = await async_login(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['userInfo']['email'], 'login@example.com')
+        self.assertIsNotNone((await CustomUser.objects.aget(pk=self.user.pk)).last_login)
+
+        request = AsyncRequestFactory().post(
+            '/auth/api/login/', {'email': 'login@example.com', 'password': 'wrong'}, content_type='application/json',
+        )
+        self.assertEqual((await async_login(request)).status_code, 401)
@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.urls import path
 from . import views
+from django.conf import settings
 from rest_framework_simplejwt.views import TokenRefreshView
 urlpatterns = [
     path('api/register/', views.RegisterView.as_view(), name='register'),
-    path('api/login/', views.LoginView.as_view(), name='login'),
+    path('api/login/', views.async_login if settings.API_MODE == 'async' else views.LoginView.as_view(), name='login'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
 ]
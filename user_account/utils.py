@@ -1,9 +1,15 @@
 # utils.py
 
+import time
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import ISSUED_NS_CLAIM
 
 def get_tokens(user):
     refresh = RefreshToken.for_user(user)
+    # Copied into the access token, StatelessJWTAuthentication builds request.user from them
+    refresh['is_active'] = user.is_active
+    refresh['is_staff'] = user.is_staff
+    refresh[ISSUED_NS_CLAIM] = time.time_ns()
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
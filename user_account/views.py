@@ -1,12 +1,18 @@
+import json
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import CustomUserSerializer
 from rest_framework.permissions import AllowAny
-from django.utils import timezone
 from rest_framework.views import APIView
 from .utils import get_tokens
+from .last_login import record_login, arecord_login
+from .backends import PooledModelBackend
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth import authenticate
 
 class RegisterView(generics.CreateAPIView):
@@ -40,9 +46,8 @@ class LoginView(APIView):
         if user is None:
             return Response({'error': 'Invalid email or password.'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        # Update last login timestamp
-        user.last_login = timezone.now()
-        user.save(update_fields=['last_login'])
+        # Update last login timestamp, written in batches when LAST_LOGIN_FLUSH_INTERVAL is set
+        record_login(user)
 
         # Serialize user data
         serialized_data = CustomUserSerializer(user).data
@@ -60,6 +65,46 @@ class LoginView(APIView):
         response.set_cookie(key='jwt', value=token, httponly=True)
 
         return response
-    
 
 
+# Async login for API_MODE = 'async', same responses as LoginView
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return _json_response({'detail': 'JSON parse error.'}, status.HTTP_400_BAD_REQUEST)
+    else:
+        data = request.POST
+
+    email = data.get('email')
+    password = data.get('password')
+
+    if not email or not password:
+        return _json_response({'error': 'Email and password are required.'}, status.HTTP_400_BAD_REQUEST)
+
+    # Password hashing runs on the backend's thread pool, the event loop keeps serving
+    user = await PooledModelBackend().aauthenticate(request, email=email, password=password)
+
+    if user is None:
+        return _json_response({'error': 'Invalid email or password.'}, status.HTTP_401_UNAUTHORIZED)
+
+    await arecord_login(user)
+    token = get_tokens(user)
+
+    response = _json_response({
+        'userInfo': CustomUserSerializer(user).data,
+        'token': token,
+        'message': 'Successfully logged in',
+        'status': status.HTTP_200_OK
+    })
+    response.set_cookie(key='jwt', value=token, httponly=True)
+    return response
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,12 +42,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'user_account',
     'employees',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'employees.middleware.RequestMetricsMiddleware',
+    # Below the metrics, so response sizes are recorded as sent
+    'employees.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -91,6 +96,13 @@ WSGI_APPLICATION = 'user_managment_app.wsgi.application'
 # }
 
 
+# DB_CONN_MODE: 'none' opens a connection per request, 'persistent' keeps one per worker thread
+# for DB_CONN_MAX_AGE seconds (checked before reuse), 'pool' uses psycopg's connection pool
+# (needs pip install "psycopg[pool]")
+DB_CONN_MODE = config('DB_CONN_MODE', default='none')
+if DB_CONN_MODE not in ('none', 'persistent', 'pool'):
+    raise ImproperlyConfigured(f"DB_CONN_MODE must be 'none', 'persistent' or 'pool', not {DB_CONN_MODE!r}")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -98,10 +110,32 @@ DATABASES = {
         'USER': config('DB_USER'),
         'PASSWORD':config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
-        'port':config('DB_PORT'),
+        'PORT':config('DB_PORT'),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int) if DB_CONN_MODE == 'persistent' else 0,
+        'CONN_HEALTH_CHECKS': DB_CONN_MODE == 'persistent',
+        'OPTIONS': {},
     }
 }
 
+if DB_CONN_MODE == 'pool':
+    # Django's pool only works with psycopg 3, psycopg2 would ignore the option
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured('DB_CONN_MODE=pool needs psycopg 3 and its pool: pip install "psycopg[binary,pool]"')
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        # Seconds a request waits for a free connection before failing
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+    }
+
+# Optional, PostgreSQL partitioning of the employee table on user_id: 'hash' or 'list'.
+# New databases are created partitioned, existing ones are converted with manage.py partition_employees
+EMPLOYEE_PARTITIONING = config('EMPLOYEE_PARTITIONING', default='')
+EMPLOYEE_HASH_PARTITIONS = config('EMPLOYEE_HASH_PARTITIONS', default=16, cast=int)
+
 
 
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -121,14 +155,86 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# password hashing, PASSWORD_HASHER picks the hasher for new hashes (pbkdf2, argon2 or bcrypt),
+# the others stay listed so existing hashes still verify. argon2 needs argon2-cffi, bcrypt needs bcrypt
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'user_account.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'user_account.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'user_account.hashers.TunedBCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.ScryptPasswordHasher']
+
+# Cost of new hashes, 0 keeps Django's default
+PBKDF2_ITERATIONS = config('PBKDF2_ITERATIONS', default=0, cast=int)
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=0, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=0, cast=int)  # KiB
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=0, cast=int)
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=0, cast=int)
+
+AUTHENTICATION_BACKENDS = ['user_account.backends.PooledModelBackend']
+# Threads hashing passwords at once, 0 is one per CPU
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=0, cast=int)
+# Seconds last_login writes are batched for, 0 writes on every login
+LAST_LOGIN_FLUSH_INTERVAL = config('LAST_LOGIN_FLUSH_INTERVAL', default=0, cast=float)
+
 # restapi 
 
+# 'async' serves the employee list/detail and login from async views, for ASGI deployments
+API_MODE = config('API_MODE', default='sync')
+
+# Stateless JWT auth builds request.user from the token claims instead of a query per request
+JWT_STATELESS_AUTH = config('JWT_STATELESS_AUTH', default=False, cast=bool)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        'user_account.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Same bytes as DRF's JSONRenderer, encoded with orjson when it is installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'employees.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Response compression, negotiated from Accept-Encoding in this order of preference.
+# gzip always works, br needs pip install brotli and zstd pip install zstandard
+COMPRESSION_ENCODINGS = config(
+    'COMPRESSION_ENCODINGS', default='zstd,br,gzip',
+    cast=lambda value: tuple(encoding.strip() for encoding in value.split(',') if encoding.strip()),
+)
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
+
+
+# cache conf, Redis when REDIS_URL is set, otherwise a per-process memory cache
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 
 # Internationalization
@@ -174,34 +280,41 @@ SIMPLE_JWT = {
 
 # log conf start
 
+# employees.view writes JSON lines through a queue, a background thread formats and writes
+# them to the rotated employees.log and the console. LOG_SAMPLE_RATE keeps that share of
+# debug/info records, LOG_REDACT_FIELDS are replaced in logged payloads
+
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+# Requests slower than this many ms are logged with their SQL, 0 turns it off
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=0, cast=int)
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+LOG_SAMPLE_RATE = config('LOG_SAMPLE_RATE', default=1.0, cast=float)
+LOG_REDACT_FIELDS = config(
+    'LOG_REDACT_FIELDS', default='email,phone_number,custom_fields,password,token,access,refresh',
+    cast=lambda value: [field.strip() for field in value.split(',') if field.strip()],
+)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
-        },
-    },
     'handlers': {
-        'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-        'file': {
+        'queue': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'employees.log.QueueLogHandler',
             # here we need to mention the log file
-            'filename': os.path.join(BASE_DIR, 'employees.log'), 
-            'formatter': 'verbose',
+            'filename': os.path.join(BASE_DIR, 'employees.log'),
+            'max_bytes': config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int),
+            'backup_count': config('LOG_BACKUP_COUNT', default=5, cast=int),
+            'sample_rate': LOG_SAMPLE_RATE,
+            'redact': LOG_REDACT_FIELDS,
         },
     },
     #  access here
     'loggers': {
         'employees.view': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG', 
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
@@ -16,11 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path,include
+from employees.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('user_account.urls')),
     path('employee/', include('employees.urls')),
+    path('metrics', metrics_view, name='metrics'),
     
 
 ]